@@ -0,0 +1,72 @@
+import numpy as np
+from scipy import ndimage
+
+class LookaheadLimiter:
+    def __init__(self, sample_rate, ceiling_db=-0.3, lookahead_ms=5.0, release_ms=150.0):
+        self.sample_rate = sample_rate
+        self.ceiling = 10 ** (ceiling_db / 20)
+        self.lookahead = max(1, int(lookahead_ms * sample_rate / 1000))
+        
+        # Release: the gain recovers by 20 dB per release time
+        self.release_rate_db = 20.0 / max(1.0, release_ms * sample_rate / 1000)
+        
+        # Gain reduction metering (positive dB)
+        self.last_gain_reduction_db = 0.0
+        self.max_gain_reduction_db = 0.0
+        
+        self.delay_line = None
+        self.peak_history = np.zeros(self.lookahead)
+        self.gain_history = np.ones(self.lookahead)
+        self.release_state_db = 0.0
+    
+    @property
+    def latency(self):
+        # Output lags the input by the lookahead window
+        return self.lookahead
+    
+    def process(self, block):
+        n_samples = block.shape[0]
+        if n_samples == 0:
+            return block.copy()
+        if self.delay_line is None:
+            self.delay_line = np.zeros((self.lookahead, block.shape[1]))
+        lookahead = self.lookahead
+        
+        # Running max of the peak over the lookahead window (trailing window of lookahead + 1 samples)
+        peak = np.concatenate((self.peak_history, np.max(np.abs(block), axis=1)))
+        window = lookahead + 1
+        running_max = ndimage.maximum_filter1d(peak, window)
+        center = window // 2
+        running_max = running_max[center:center + n_samples]
+        self.peak_history = peak[-lookahead:]
+        
+        # Gain needed to keep every upcoming peak under the ceiling
+        target = np.minimum(1.0, self.ceiling / np.maximum(running_max, 1e-12))
+        target_db = 20 * np.log10(target)
+        
+        # Instant attack, linear-in-dB release: g[n] = min(target[n], g[n-1] + rate), as a cumulative min
+        ramp = self.release_rate_db * np.arange(1, n_samples + 1)
+        gain_db = np.minimum.accumulate(np.concatenate(([self.release_state_db], target_db - ramp)))[1:] + ramp
+        self.release_state_db = gain_db[-1]
+        gain = 10 ** (gain_db / 20)
+        
+        # Smooth the gain with a moving average over the lookahead so it ramps down before each peak
+        gains = np.concatenate((self.gain_history, gain))
+        totals = np.cumsum(np.concatenate(([0.0], gains)))
+        smoothed = (totals[window:] - totals[:-window]) / window
+        self.gain_history = gains[-lookahead:]
+        
+        # Apply to the delayed signal
+        delayed = np.concatenate((self.delay_line, block))
+        self.delay_line = delayed[n_samples:]
+        output = delayed[:n_samples] * smoothed[:, np.newaxis]
+        
+        self.last_gain_reduction_db = -20 * np.log10(np.min(smoothed))
+        self.max_gain_reduction_db = max(self.max_gain_reduction_db, self.last_gain_reduction_db)
+        return output
+    
+    def flush(self):
+        # Push the samples still held in the lookahead delay line out
+        if self.delay_line is None:
+            return np.zeros((0, 1))
+        return self.process(np.zeros_like(self.delay_line))
\ No newline at end of file
@@ -0,0 +1,212 @@
+import json
+import os
+import numpy as np
+from scipy import signal
+from audio.processor_effects import get_channel_layout
+
+# ITU-R BS.1770 gating
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_CONTEXT = 32  # Input samples of context on each side of a block for the resampler
+
+# Results are cached next to the audio file
+CACHE_SUFFIX = ".loudness.json"
+CACHE_VERSION = 2
+
+def design_k_weighting(sample_rate):
+    # Pre-filter (high shelf) and RLB high-pass of BS.1770, as second-order sections
+    sections = []
+    
+    # High shelf, +4 dB around 1.5 kHz (RBJ shelf; within ~0.002 dB of the 48 kHz reference filter)
+    gain_db, fc, q = 4.0, 1500.0, 1 / np.sqrt(2)
+    amp = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * fc / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    sqrt_amp = np.sqrt(amp)
+    b = [amp * ((amp + 1) + (amp - 1) * cos_w0 + 2 * sqrt_amp * alpha),
+         -2 * amp * ((amp - 1) + (amp + 1) * cos_w0),
+         amp * ((amp + 1) + (amp - 1) * cos_w0 - 2 * sqrt_amp * alpha)]
+    a = [(amp + 1) - (amp - 1) * cos_w0 + 2 * sqrt_amp * alpha,
+         2 * ((amp - 1) - (amp + 1) * cos_w0),
+         (amp + 1) - (amp - 1) * cos_w0 - 2 * sqrt_amp * alpha]
+    sections.append(np.concatenate((b, a)) / a[0])
+    
+    # RLB high-pass at ~38 Hz; BS.1770 uses an unnormalized [1, -2, 1] numerator
+    fc, q = 38.13547087613982, 0.5003270373253953
+    w0 = 2 * np.pi * fc / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    a = np.array([1 + alpha, -2 * cos_w0, 1 - alpha])
+    sections.append(np.concatenate(([1.0, -2.0, 1.0], a / a[0])))
+    
+    return np.array(sections)
+
+def power_to_lufs(power):
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-20))
+
+def _db_or_none(value, floor=-120.0):
+    # JSON has no -inf, report silence as None
+    return float(value) if value > floor else None
+
+class _SegmentAccumulator:
+    # Collects per-sample values into means over fixed-size segments across block boundaries
+    def __init__(self, size):
+        self.size = size
+        self.segments = []
+        self.partial_sum = 0.0
+        self.partial_count = 0
+    
+    def add(self, values):
+        fill = min(self.size - self.partial_count, len(values))
+        self.partial_sum += values[:fill].sum()
+        self.partial_count += fill
+        if self.partial_count < self.size:
+            return
+        self.segments.append(self.partial_sum / self.size)
+        
+        rest = values[fill:]
+        n_full = len(rest) // self.size
+        if n_full:
+            self.segments.extend(rest[:n_full * self.size].reshape(n_full, self.size).mean(axis=1))
+        leftover = rest[n_full * self.size:]
+        self.partial_sum = leftover.sum()
+        self.partial_count = len(leftover)
+    
+    def values(self, include_partial=False):
+        segments = list(self.segments)
+        if include_partial and self.partial_count:
+            segments.append(self.partial_sum / self.partial_count)
+        return np.array(segments)
+
+class LoudnessAnalyzer:
+    def __init__(self, sample_rate, num_channels, layout=None):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.num_samples = 0
+        
+        # Surround channels count +1.5 dB, LFE is ignored
+        labels = get_channel_layout(num_channels, layout)
+        self.channel_weights = np.array([
+            0.0 if label == "LFE" else 1.41 if label in ("BL", "BR", "SL", "SR") else 1.0
+            for label in labels
+        ])
+        
+        # K-weighting filter state carried between blocks
+        self.sos = design_k_weighting(sample_rate)
+        self.zi = np.zeros((self.sos.shape[0], 2, num_channels))
+        
+        # 100 ms gating segments of K-weighted power, 1 s segments of plain power for RMS
+        self.loudness_segments = _SegmentAccumulator(int(round(0.1 * sample_rate)))
+        self.rms_segments = _SegmentAccumulator(int(sample_rate))
+        
+        self.sample_peak = 0.0
+        self.true_peak = 0.0
+        self.peak_context = np.zeros((2 * TRUE_PEAK_CONTEXT, num_channels))
+    
+    def process(self, block):
+        if len(block) == 0:
+            return
+        self.num_samples += len(block)
+        
+        # K-weighted, channel-weighted power per sample
+        weighted, self.zi = signal.sosfilt(self.sos, block, axis=0, zi=self.zi)
+        self.loudness_segments.add((weighted ** 2) @ self.channel_weights)
+        
+        squared = block ** 2
+        self.rms_segments.add(squared.mean(axis=1))
+        
+        self.sample_peak = max(self.sample_peak, np.max(np.abs(block)))
+        self._update_true_peak(block)
+    
+    def _update_true_peak(self, block):
+        # Oversample with context from the previous block so block edges don't create false peaks
+        buffer = np.concatenate((self.peak_context, block))
+        self.peak_context = buffer[-2 * TRUE_PEAK_CONTEXT:]
+        
+        upsampled = signal.resample_poly(buffer, TRUE_PEAK_OVERSAMPLING, 1, axis=0)
+        start = TRUE_PEAK_CONTEXT * TRUE_PEAK_OVERSAMPLING
+        end = (len(buffer) - TRUE_PEAK_CONTEXT) * TRUE_PEAK_OVERSAMPLING
+        if end > start:
+            self.true_peak = max(self.true_peak, np.max(np.abs(upsampled[start:end])))
+    
+    def finish(self):
+        # Flush the samples still held back for true-peak context
+        self._update_true_peak(np.zeros((2 * TRUE_PEAK_CONTEXT, self.num_channels)))
+        
+        segments = self.loudness_segments.values()
+        
+        # Gated integrated loudness over 400 ms blocks with 75% overlap
+        integrated = None
+        if len(segments) >= 4:
+            block_power = np.lib.stride_tricks.sliding_window_view(segments, 4).mean(axis=1)
+            block_power = block_power[power_to_lufs(block_power) > ABSOLUTE_GATE_LUFS]
+            if len(block_power):
+                relative_gate = power_to_lufs(block_power.mean()) + RELATIVE_GATE_LU
+                block_power = block_power[power_to_lufs(block_power) > relative_gate]
+                integrated = _db_or_none(power_to_lufs(block_power.mean()))
+        
+        # Short-term loudness (3 s window), one value per second
+        short_term = []
+        if len(segments) >= 30:
+            window_power = np.lib.stride_tricks.sliding_window_view(segments, 30).mean(axis=1)
+            short_term = [_db_or_none(value) for value in power_to_lufs(window_power[::10])]
+        
+        rms = self.rms_segments.values(include_partial=True)
+        rms_db = 10 * np.log10(np.maximum(rms, 1e-20))
+        
+        return {
+            "sample_rate": self.sample_rate,
+            "duration": self.num_samples / self.sample_rate,
+            "integrated_lufs": integrated,
+            "short_term_lufs": short_term,
+            "max_short_term_lufs": max((value for value in short_term if value is not None), default=None),
+            "true_peak_dbtp": _db_or_none(20 * np.log10(max(self.true_peak, 1e-20))),
+            "sample_peak_dbfs": _db_or_none(20 * np.log10(max(self.sample_peak, 1e-20))),
+            "rms_dbfs": [_db_or_none(value) for value in rms_db],
+        }
+
+def analyze_audio(audio, sample_rate, layout=None, block_size=65536):
+    analyzer = LoudnessAnalyzer(sample_rate, audio.shape[1], layout)
+    for block_start in range(0, audio.shape[0], block_size):
+        analyzer.process(audio[block_start:block_start + block_size])
+    return analyzer.finish()
+
+def _cache_key(file_path, layout):
+    # The cache is only valid for the same file contents and channel weighting
+    stat = os.stat(file_path)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime": stat.st_mtime, "channel_layout": layout}
+
+def load_cached_analysis(file_path, layout=None):
+    try:
+        with open(file_path + CACHE_SUFFIX) as f:
+            cached = json.load(f)
+        if cached.get("key") == _cache_key(file_path, layout):
+            return cached["analysis"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def save_cached_analysis(file_path, analysis, layout=None):
+    try:
+        with open(file_path + CACHE_SUFFIX, "w") as f:
+            json.dump({"key": _cache_key(file_path, layout), "analysis": analysis}, f)
+    except OSError:
+        # Read-only locations just don't get a cache
+        pass
+
+def get_analysis(file_path, audio, sample_rate, layout=None):
+    # Cached result if the file is unchanged, otherwise analyze the decoded audio and cache it
+    analysis = load_cached_analysis(file_path, layout)
+    if analysis is None:
+        analysis = analyze_audio(audio, sample_rate, layout)
+        save_cached_analysis(file_path, analysis, layout)
+    return analysis
+
+def normalization_gain(analysis, target_lufs):
+    # Linear gain that brings the integrated loudness to the target
+    if analysis is None or analysis.get("integrated_lufs") is None:
+        return None
+    return 10 ** ((target_lufs - analysis["integrated_lufs"]) / 20)
\ No newline at end of file
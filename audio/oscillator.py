@@ -0,0 +1,65 @@
+import numpy as np
+
+class SineOscillator:
+    def __init__(self, frequency, amplitude=1.0, glide_time=0.05):
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.glide_time = glide_time  # Seconds to reach a new frequency
+        
+        # Phase (radians) of the next sample to be generated
+        self.phase = 0.0
+        
+        # Glide state
+        self.target_frequency = frequency
+        self.glide_from = frequency
+        self.glide_position = 0
+    
+    def set_frequency(self, frequency):
+        if frequency == self.target_frequency:
+            return
+        
+        # Glide from wherever we currently are instead of restarting the phase
+        self.glide_from = self.frequency
+        self.target_frequency = frequency
+        self.glide_position = 0
+    
+    def reset(self, phase=0.0):
+        self.phase = phase
+        self.frequency = self.target_frequency
+        self.glide_from = self.target_frequency
+        self.glide_position = 0
+    
+    def render(self, num_samples, sample_rate, out=None):
+        if out is None:
+            out = np.empty(num_samples)
+        
+        if self.frequency == self.target_frequency:
+            # Constant frequency: phase grows linearly
+            increment = 2 * np.pi * self.frequency / sample_rate
+            np.multiply(np.arange(num_samples), increment, out=out)
+            out += self.phase
+            end_phase = self.phase + num_samples * increment
+        else:
+            # Linear frequency ramp; the phase is the running sum of per-sample increments
+            glide_samples = max(1, int(self.glide_time * sample_rate))
+            steps = self.glide_position + np.arange(1, num_samples + 1)
+            fraction = np.minimum(steps / glide_samples, 1.0)
+            frequencies = self.glide_from + (self.target_frequency - self.glide_from) * fraction
+            
+            increments = 2 * np.pi * frequencies / sample_rate
+            np.cumsum(increments, out=out)
+            end_phase = self.phase + out[-1] if num_samples else self.phase
+            out -= increments
+            out += self.phase
+            
+            self.glide_position += num_samples
+            self.frequency = frequencies[-1] if num_samples else self.frequency
+            if self.glide_position >= glide_samples:
+                self.frequency = self.target_frequency
+        
+        # Keep the accumulator small so precision does not degrade on long streams
+        self.phase = end_phase % (2 * np.pi)
+        
+        np.sin(out, out=out)
+        out *= self.amplitude
+        return out
\ No newline at end of file
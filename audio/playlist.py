@@ -0,0 +1,293 @@
+import numpy as np
+from scipy import signal
+import simpleaudio as sa
+import threading
+import time
+from collections import deque
+from math import gcd
+from audio.processor import decode_audio_file, to_int16
+from audio.processor_effects import downmix_to_stereo
+
+# Gapless playback needs a callback stream that tracks can be appended to; simpleaudio cannot do that
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # Missing package or missing PortAudio library
+    sd = None
+
+class PlaylistPlayer:
+    def __init__(self, audio_processor, prefetch_budget_mb=256):
+        self.audio_processor = audio_processor
+        self.tracks = []
+        self.current_index = 0
+        self.sample_rate = None
+        self.prefetch_budget = int(prefetch_budget_mb * 1024 * 1024)
+        
+        # Rendered int16 buffers waiting to be played: index -> (settings_version, buffer)
+        self.prefetched = {}
+        # Buffer taken by the playback loop that is waiting for its start time
+        self.held_buffer = None
+        self.condition = threading.Condition()
+        
+        # Continuous output: tracks queued back to back for the stream callback, and the read position in the first
+        self.output_queue = deque()
+        self.output_position = 0
+        
+        self.stream = None
+        self.play_obj = None
+        self.is_playing = False
+        self.stop_thread = False
+        self.playback_thread = None
+        self.prefetch_thread = None
+        
+        # Incremented on every play() so workers left over from an earlier run can tell they are stale
+        self.session = 0
+    
+    def add_track(self, file_path):
+        with self.condition:
+            self.tracks.append(file_path)
+            self.condition.notify_all()
+    
+    def clear(self):
+        self.stop()
+        self.tracks = []
+        self.current_index = 0
+    
+    def set_prefetch_budget(self, budget_mb):
+        with self.condition:
+            self.prefetch_budget = int(budget_mb * 1024 * 1024)
+            self.condition.notify_all()
+    
+    def play(self, start_index=0):
+        if not self.tracks:
+            return
+        
+        # Stop any current playback
+        self.stop()
+        
+        self.current_index = start_index
+        self.sample_rate = None
+        self.is_playing = True
+        self.stop_thread = False
+        self.session += 1
+        
+        # Decode and render upcoming tracks in the background
+        self.prefetch_thread = threading.Thread(target=self._prefetch_worker, args=(self.session,))
+        self.prefetch_thread.daemon = True
+        self.prefetch_thread.start()
+        
+        self.playback_thread = threading.Thread(target=self._playback_loop)
+        self.playback_thread.daemon = True
+        self.playback_thread.start()
+    
+    def stop(self):
+        self.is_playing = False
+        
+        with self.condition:
+            self.stop_thread = True
+            self.condition.notify_all()
+        
+        if self.play_obj is not None and self.play_obj.is_playing():
+            self.play_obj.stop()
+            self.play_obj = None
+        
+        for thread in (self.playback_thread, self.prefetch_thread):
+            if thread is not None:
+                thread.join(1.0)  # Wait for 1 second
+        self.playback_thread = None
+        self.prefetch_thread = None
+        
+        with self.condition:
+            self.prefetched = {}
+            self.held_buffer = None
+            self.output_queue.clear()
+            self.output_position = 0
+    
+    def _prefetched_bytes(self):
+        total = sum(buffer.nbytes for _, buffer in self.prefetched.values() if buffer is not None)
+        if self.held_buffer is not None:
+            total += self.held_buffer.nbytes
+        total += sum(buffer.nbytes for buffer in self.output_queue)
+        return total
+    
+    def _next_to_prefetch(self):
+        # Pick the first upcoming track that is missing or was rendered with old settings
+        version = self.audio_processor.settings_version
+        for index in range(self.current_index, len(self.tracks)):
+            entry = self.prefetched.get(index)
+            if entry is not None and entry[0] == version:
+                continue
+            
+            # The next track to hand off is always allowed so playback never waits on the budget
+            if index > self.current_index and self._prefetched_bytes() >= self.prefetch_budget:
+                return None
+            return index
+        return None
+    
+    def _prefetch_worker(self, session):
+        while True:
+            with self.condition:
+                index = None
+                while not self.stop_thread and session == self.session:
+                    index = self._next_to_prefetch()
+                    if index is not None:
+                        break
+                    # Wake up periodically to notice settings changes
+                    self.condition.wait(0.2)
+                if self.stop_thread or session != self.session:
+                    return
+                file_path = self.tracks[index]
+                version = self.audio_processor.settings_version
+            
+            try:
+                buffer = self._render_track(file_path)
+            except Exception:
+                # Unreadable tracks are skipped by the playback loop
+                buffer = None
+            
+            with self.condition:
+                if self.stop_thread or session != self.session:
+                    return
+                if index >= self.current_index:
+                    self.prefetched[index] = (version, buffer)
+                self.condition.notify_all()
+    
+    def _render_track(self, file_path):
+        audio_data, sample_rate = decode_audio_file(file_path)
+        
+        # The first decoded track fixes the output rate for the whole queue
+        if self.sample_rate is None:
+            self.sample_rate = sample_rate
+        elif sample_rate != self.sample_rate:
+            divisor = gcd(self.sample_rate, sample_rate)
+            audio_data = signal.resample_poly(
+                audio_data, self.sample_rate // divisor, sample_rate // divisor, axis=0
+            )
+        
+        self.audio_processor.reset_binaural()
+        processed = self.audio_processor._apply_all_processing(audio_data, self.sample_rate)
+        processed = downmix_to_stereo(processed, self.audio_processor.channel_layout)
+        # Every track goes out as stereo so mono and stereo files can share one output stream
+        if processed.shape[1] == 1:
+            processed = np.repeat(processed, 2, axis=1)
+        return np.ascontiguousarray(to_int16(processed))
+    
+    def _take_track(self):
+        # Hand the next track to the playback loop and move the prefetch window past it,
+        # so the worker never re-renders a track that is already waiting to be played
+        with self.condition:
+            while not self.stop_thread:
+                # A buffer rendered with slightly older settings still beats a stall
+                if self.current_index in self.prefetched:
+                    buffer = self.prefetched.pop(self.current_index)[1]
+                    self.current_index += 1
+                    self.held_buffer = buffer
+                    self.condition.notify_all()
+                    return buffer
+                self.condition.wait(0.05)
+        return None
+    
+    def _release_track(self):
+        with self.condition:
+            self.held_buffer = None
+            self.condition.notify_all()
+    
+    def _fill_output(self, outdata, frames, time_info, status):
+        # Runs on the audio device's thread: copy queued tracks back to back, silence only if nothing is queued
+        filled = 0
+        with self.condition:
+            while filled < frames and self.output_queue and not self.stop_thread:
+                buffer = self.output_queue[0]
+                count = min(frames - filled, len(buffer) - self.output_position)
+                outdata[filled:filled + count] = buffer[self.output_position:self.output_position + count]
+                filled += count
+                self.output_position += count
+                
+                if self.output_position == len(buffer):
+                    # Track finished, the next one continues on the very next sample
+                    self.output_queue.popleft()
+                    self.output_position = 0
+                    self.condition.notify_all()
+        outdata[filled:] = 0
+    
+    def _playback_loop(self):
+        if sd is not None:
+            self._play_continuous()
+        else:
+            self._play_per_track()
+        self.is_playing = False
+    
+    def _play_continuous(self):
+        # One output stream for the whole queue; the device pulls samples, so track boundaries are sample-accurate
+        try:
+            while not self.stop_thread and self.current_index < len(self.tracks):
+                buffer = self._take_track()
+                if buffer is None:
+                    # Stopped, or the track failed to decode and was skipped
+                    continue
+                
+                with self.condition:
+                    self.output_queue.append(buffer)
+                    self.held_buffer = None
+                
+                if self.stream is None:
+                    self.stream = sd.OutputStream(
+                        samplerate=self.sample_rate, channels=2, dtype="int16", callback=self._fill_output
+                    )
+                    self.stream.start()
+                
+                # Keep only the playing track and the next one queued, the rest stays under the prefetch budget
+                with self.condition:
+                    while not self.stop_thread and len(self.output_queue) > 1:
+                        self.condition.wait(0.1)
+            
+            # Let the last track play out
+            with self.condition:
+                while not self.stop_thread and self.output_queue:
+                    self.condition.wait(0.1)
+        finally:
+            if self.stream is not None:
+                if self.stop_thread:
+                    self.stream.abort()
+                else:
+                    self.stream.stop()
+                self.stream.close()
+                self.stream = None
+    
+    def _sleep_until(self, deadline):
+        while not self.stop_thread:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.05))
+    
+    def _play_per_track(self):
+        # Fallback without sounddevice, one simpleaudio stream per track
+        next_start = None
+        
+        while not self.stop_thread and self.current_index < len(self.tracks):
+            buffer = self._take_track()
+            if buffer is None:
+                # Stopped, or the track failed to decode and was skipped
+                continue
+            
+            # simpleaudio cannot append to a running stream, so every track opens a new one when the
+            # previous track should have run out. Device start-up latency and clock drift mean the
+            # boundary is not sample-accurate: expect a short gap or overlap between tracks.
+            if next_start is not None:
+                self._sleep_until(next_start)
+                if self.stop_thread:
+                    break
+            
+            self.play_obj = sa.play_buffer(
+                buffer, num_channels=buffer.shape[1], bytes_per_sample=2, sample_rate=self.sample_rate
+            )
+            started = time.perf_counter() if next_start is None else next_start
+            next_start = started + buffer.shape[0] / self.sample_rate
+            
+            # simpleaudio has its own copy now, free the slot for further prefetching
+            self._release_track()
+        
+        # Wait for the last track to finish
+        while self.play_obj is not None and self.play_obj.is_playing() and not self.stop_thread:
+            time.sleep(0.1)
\ No newline at end of file
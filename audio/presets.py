@@ -0,0 +1,126 @@
+import hashlib
+import json
+import numpy as np
+from audio import processor_effects
+from audio.processor import equalizer_params
+
+PRESET_FORMAT = "audio-equalizer-preset"
+PRESET_VERSION = 1
+
+# Sample rates compiled into every preset (plus the rate of the loaded file)
+DEFAULT_SAMPLE_RATES = (44100, 48000)
+
+def capture_settings(processor):
+    # Full chain settings of an AudioProcessor as plain JSON types
+    return {
+        "volume": processor.volume,
+        "equalizer": {str(freq): gain for freq, gain in processor.equalizer_values.items()},
+        "surround": {"enabled": processor.surround_enabled, "intensity": processor.surround_intensity},
+        "audio_8d": {"enabled": processor.audio_8d_enabled, "speed": processor.audio_8d_speed},
+        "binaural": {"enabled": processor.binaural_enabled, "freq": processor.binaural_freq},
+        "bass_boost": {"enabled": processor.bass_boost_enabled, "amount": processor.bass_boost_amount},
+        "reverb": {"enabled": processor.reverb_enabled, "amount": processor.reverb_amount},
+        "limiter": {
+            "enabled": processor.limiter_enabled,
+            "ceiling_db": processor.limiter_ceiling_db,
+            "lookahead_ms": processor.limiter_lookahead_ms,
+            "release_ms": processor.limiter_release_ms,
+        },
+        "channel_layout": processor.channel_layout,
+    }
+
+def apply_settings(processor, settings):
+    processor.set_volume(settings["volume"])
+    processor.set_equalizer({int(freq): gain for freq, gain in settings["equalizer"].items()})
+    processor.set_surround(**settings["surround"])
+    processor.set_8d_audio(**settings["audio_8d"])
+    processor.set_binaural(**settings["binaural"])
+    processor.set_bass_boost(**settings["bass_boost"])
+    processor.set_reverb(**settings["reverb"])
+    processor.set_limiter(**settings["limiter"])
+    processor.set_channel_layout(settings["channel_layout"])
+
+def design_params(settings):
+    # Design cache parameters of each compiled effect, as the processor looks them up
+    equalizer_values = {int(freq): gain for freq, gain in settings["equalizer"].items()}
+    return {
+        "equalizer": equalizer_params(equalizer_values),
+        "bass_boost": settings["bass_boost"]["amount"],
+        "reverb": settings["reverb"]["amount"],
+    }
+
+def params_hash(params):
+    # Fingerprint of the parameters a compiled design was built from
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()
+
+def compile_settings(settings, sample_rates):
+    # Precompute every filter design the chain needs at each sample rate
+    equalizer_values = {int(freq): gain for freq, gain in settings["equalizer"].items()}
+    hashes = {effect: params_hash(params) for effect, params in design_params(settings).items()}
+    compiled = {}
+    for sample_rate in sample_rates:
+        b, a, gain = processor_effects.design_bass_boost(sample_rate, settings["bass_boost"]["amount"])
+        delays, amplitudes = processor_effects.design_reverb(sample_rate, settings["reverb"]["amount"])
+        compiled[str(sample_rate)] = {
+            "equalizer": processor_effects.design_equalizer(sample_rate, equalizer_values).tolist(),
+            "bass_boost": {"b": b.tolist(), "a": a.tolist(), "gain": gain},
+            "reverb": {"delays": delays.tolist(), "amplitudes": amplitudes.tolist()},
+            # Lets loading detect settings that were edited without recompiling
+            "params": hashes,
+        }
+    return compiled
+
+def save_preset(file_path, processor, name=None, sample_rates=DEFAULT_SAMPLE_RATES):
+    sample_rates = set(sample_rates)
+    if processor.sample_rate is not None:
+        sample_rates.add(processor.sample_rate)
+    
+    settings = capture_settings(processor)
+    preset = {
+        "format": PRESET_FORMAT,
+        "version": PRESET_VERSION,
+        "name": name,
+        "settings": settings,
+        "compiled": compile_settings(settings, sorted(sample_rates)),
+    }
+    
+    with open(file_path, "w") as f:
+        json.dump(preset, f, indent=2)
+    return preset
+
+def load_preset(file_path):
+    with open(file_path) as f:
+        preset = json.load(f)
+    
+    if preset.get("format") != PRESET_FORMAT:
+        raise ValueError(f"Not a preset file: {file_path}")
+    if preset.get("version", 0) > PRESET_VERSION:
+        raise ValueError(f"Unsupported preset version: {preset.get('version')}")
+    
+    # Turn the stored designs back into arrays once, so applying the preset is just a lookup
+    designs = {}
+    for sample_rate, compiled in preset.get("compiled", {}).items():
+        bass_boost = compiled["bass_boost"]
+        reverb = compiled["reverb"]
+        designs[int(sample_rate)] = {
+            "equalizer": np.array(compiled["equalizer"]),
+            "bass_boost": (np.array(bass_boost["b"]), np.array(bass_boost["a"]), bass_boost["gain"]),
+            "reverb": (np.array(reverb["delays"], dtype=int), np.array(reverb["amplitudes"])),
+            "params": compiled.get("params", {}),
+        }
+    preset["designs"] = designs
+    return preset
+
+def apply_preset(processor, preset):
+    settings = preset["settings"]
+    
+    # Seed the design cache under the same keys the processor looks up. Presets are editable JSON, so only
+    # designs compiled from the current settings are trusted; the rest are designed again when needed.
+    params = design_params(settings)
+    hashes = {effect: params_hash(effect_params) for effect, effect_params in params.items()}
+    for sample_rate, designs in preset.get("designs", {}).items():
+        for effect, effect_params in params.items():
+            if designs["params"].get(effect) == hashes[effect]:
+                processor.add_design(effect, sample_rate, effect_params, designs[effect])
+    
+    apply_settings(processor, settings)
@@ -8,18 +8,60 @@ from pydub import AudioSegment
 import io
 import os
 import tempfile
+from math import gcd
+from collections import OrderedDict
+from audio import processor_effects
+from audio import loudness
+
+def decode_audio_file(file_path):
+    # Use pydub to load various audio formats
+    audio = AudioSegment.from_file(file_path)
+    
+    # Convert to numpy array
+    samples = np.array(audio.get_array_of_samples())
+    
+    # Convert to float32 in range [-1, 1]
+    if audio.sample_width == 2:  # 16-bit audio
+        samples = samples / 32768.0
+    elif audio.sample_width == 1:  # 8-bit audio
+        samples = (samples / 128.0) - 1.0
+    elif audio.sample_width == 3:  # 24-bit audio
+        samples = samples / 8388608.0
+    elif audio.sample_width == 4:  # 32-bit audio
+        samples = samples / 2147483648.0
+    
+    # Convert to stereo if mono
+    if audio.channels == 1:
+        audio_data = np.column_stack((samples, samples))
+    else:
+        # Reshape to (n_samples, n_channels), keeping every channel
+        audio_data = samples.reshape(-1, audio.channels)
+    
+    return audio_data, audio.frame_rate
+
+def equalizer_params(equalizer_values):
+    # Hashable form of the band gains, used as a design cache key
+    return tuple(sorted((int(freq), float(gain)) for freq, gain in equalizer_values.items()))
+
+# Shortest preview excerpt; anything shorter is not worth looping
+PREVIEW_MIN_SECONDS = 2.0
+
+def to_int16(audio):
+    # Convert float audio in [-1, 1] to int16 for simpleaudio
+    return (audio * 32767).astype(np.int16)
 
 class AudioProcessor:
     def __init__(self):
         self.audio_data = None
         self.sample_rate = None
         self.file_path = None
+        self.analysis = None  # Loudness/peak analysis of the loaded file
         self.play_obj = None
         self.is_playing = False
         
         # Processing settings
         self.volume = 1.0
-        self.equalizer_values = {32: 0, 64: 0, 125: 0, 250: 0, 500: 0, 
+        self.equalizer_values = {32: 0, 64: 0, 125: 0, 250: 0, 500: 0,
                                1000: 0, 2000: 0, 4000: 0, 8000: 0, 16000: 0}
         
         # Effects settings
@@ -29,45 +71,58 @@ class AudioProcessor:
         self.audio_8d_speed = 30
         self.binaural_enabled = False
         self.binaural_freq = 30
+        # Carrier oscillators shared by all renders, so re-renders continue the phase and glide to a new beat
+        self.binaural_oscillators = processor_effects.create_binaural_oscillators(self.binaural_freq)
+        self.binaural_lock = threading.Lock()
         self.bass_boost_enabled = False
         self.bass_boost_amount = 0.5
         self.reverb_enabled = False
         self.reverb_amount = 0.3
         
+        # Output limiter settings
+        self.limiter_enabled = True
+        self.limiter_ceiling_db = -0.3
+        self.limiter_lookahead_ms = 5.0
+        self.limiter_release_ms = 150.0
+        self.limiter_gain_reduction_db = 0.0  # Peak gain reduction of the last render
+        
+        # Speaker layout used by the spatial effects (None = guess from channel count)
+        self.channel_layout = None
+        
+        # Preview settings (fast auditioning on a decimated proxy of the track)
+        self.preview_enabled = False
+        self.preview_rate = 22050
+        self.preview_start = 0.0
+        self.preview_duration = None  # Seconds, None = whole track
+        self.preview_loop = False
+        self.preview_audio = None
+        self.preview_sample_rate = None
+        
+        # Filter designs keyed by (effect, sample rate, parameters); presets pre-fill it
+        self.design_cache = OrderedDict()
+        self.design_cache_size = 64
+        self.design_lock = threading.Lock()
+        
+        # Bumped on every settings change so pre-rendered audio can be invalidated
+        self.settings_version = 0
+        
         # Processing thread
         self.processing_thread = None
         self.stop_thread = False
     
     def load_file(self, file_path):
         self.file_path = file_path
+        self.audio_data, self.sample_rate = decode_audio_file(file_path)
         
-        # Use pydub to load various audio formats
-        audio = AudioSegment.from_file(file_path)
-        
-        # Convert to numpy array
-        samples = np.array(audio.get_array_of_samples())
-        
-        # Convert to float32 in range [-1, 1]
-        if audio.sample_width == 2:  # 16-bit audio
-            samples = samples / 32768.0
-        elif audio.sample_width == 1:  # 8-bit audio
-            samples = (samples / 128.0) - 1.0
-        elif audio.sample_width == 3:  # 24-bit audio
-            samples = samples / 8388608.0
-        elif audio.sample_width == 4:  # 32-bit audio
-            samples = samples / 2147483648.0
-        
-        # Convert to stereo if mono
-        if audio.channels == 1:
-            self.audio_data = np.column_stack((samples, samples))
-        else:
-            # Reshape to (n_samples, n_channels)
-            self.audio_data = samples.reshape(-1, audio.channels)
-            # Ensure we have exactly 2 channels (stereo)
-            if audio.channels > 2:
-                self.audio_data = self.audio_data[:, :2]
+        # Measure loudness while the decoded audio is at hand (or reuse the cached result)
+        self.analysis = loudness.get_analysis(file_path, self.audio_data, self.sample_rate, self.channel_layout)
         
-        self.sample_rate = audio.frame_rate
+        # A new track starts its binaural carrier from zero phase
+        self.reset_binaural()
+        
+        # The preview proxy belongs to the previous file
+        self.preview_audio = None
+        self.preview_sample_rate = None
         
         # Stop any current playback
         self.stop()
@@ -101,80 +156,261 @@ class AudioProcessor:
             self.processing_thread = None
     
     def _process_and_play(self):
-        # Get processed audio
-        processed_audio = self._apply_all_processing()
+        while True:
+            # Preview renders the cheap proxy, otherwise the full-rate track
+            if self.preview_enabled:
+                audio, sample_rate = self._get_preview_excerpt()
+            else:
+                audio, sample_rate = self.audio_data, self.sample_rate
+            
+            # Get processed audio
+            processed_audio = self._apply_all_processing(audio, sample_rate)
+            
+            # simpleaudio only plays mono/stereo, so fold surround down for monitoring
+            processed_audio = processor_effects.downmix_to_stereo(processed_audio, self.channel_layout)
+            
+            # Convert to int16 for simpleaudio
+            audio_int16 = to_int16(processed_audio)
+            
+            # Play audio
+            self.play_obj = sa.play_buffer(
+                audio_int16, num_channels=audio_int16.shape[1], bytes_per_sample=2, sample_rate=sample_rate
+            )
+            
+            # Wait for playback to finish
+            while self.play_obj.is_playing() and not self.stop_thread:
+                time.sleep(0.1)
+            
+            # A looped preview re-renders each pass so it picks up parameter changes.
+            # Very short tracks are not looped, re-rendering them would just spin the CPU.
+            if self.stop_thread or not (self.preview_enabled and self.preview_loop):
+                break
+            if len(audio) < PREVIEW_MIN_SECONDS * sample_rate:
+                break
         
-        # Convert to int16 for simpleaudio
-        audio_int16 = (processed_audio * 32767).astype(np.int16)
+        # Set playing flag to False when done
+        self.is_playing = False
+    
+    def _get_preview_proxy(self):
+        # Decimate the whole track once per file; excerpts are sliced from this
+        if self.preview_audio is None:
+            if self.preview_rate >= self.sample_rate:
+                self.preview_audio = self.audio_data
+                self.preview_sample_rate = self.sample_rate
+            else:
+                divisor = gcd(self.preview_rate, self.sample_rate)
+                self.preview_audio = signal.resample_poly(
+                    self.audio_data, self.preview_rate // divisor, self.sample_rate // divisor, axis=0
+                )
+                self.preview_sample_rate = self.preview_rate
         
-        # Play audio
-        self.play_obj = sa.play_buffer(
-            audio_int16, num_channels=2, bytes_per_sample=2, sample_rate=self.sample_rate
-        )
+        return self.preview_audio, self.preview_sample_rate
+    
+    def _get_preview_excerpt(self):
+        audio, sample_rate = self._get_preview_proxy()
         
-        # Wait for playback to finish
-        while self.play_obj.is_playing() and not self.stop_thread:
-            time.sleep(0.1)
+        # Keep at least the excerpt length (or a minimum) before the end, so a start
+        # past the end of the track plays the tail instead of a near-empty buffer
+        if self.preview_duration is None:
+            length = int(PREVIEW_MIN_SECONDS * sample_rate)
+        else:
+            length = max(int(self.preview_duration * sample_rate), int(PREVIEW_MIN_SECONDS * sample_rate))
+        start = max(0, min(int(self.preview_start * sample_rate), len(audio) - length))
         
-        # Set playing flag to False when done
-        self.is_playing = False
+        if self.preview_duration is None:
+            return audio[start:], sample_rate
+        return audio[start:start + length], sample_rate
     
-    def _apply_all_processing(self):
+    def _apply_all_processing(self, audio=None, sample_rate=None, progress=None):
+        # Default to the loaded file; other callers (e.g. the playlist) pass their own audio
+        if audio is None:
+            audio = self.audio_data
+        if sample_rate is None:
+            sample_rate = self.sample_rate
+        
+        # Optional progress(stage, fraction_done) callback, called before each stage
+        stages = ["equalizer"] + [name for name, enabled in (
+            ("surround", self.surround_enabled), ("8d_audio", self.audio_8d_enabled),
+            ("binaural", self.binaural_enabled), ("bass_boost", self.bass_boost_enabled),
+            ("reverb", self.reverb_enabled)) if enabled] + ["output"]
+        
+        def report(stage):
+            if progress is not None:
+                progress(stage, stages.index(stage) / len(stages))
+        
         # Make a copy of the original audio
-        processed = np.copy(self.audio_data)
+        processed = np.copy(audio)
         
         # Apply equalizer
-        processed = self._apply_equalizer(processed)
+        report("equalizer")
+        processed = self._apply_equalizer(processed, sample_rate)
         
         # Apply effects
         if self.surround_enabled:
+            report("surround")
             processed = self._apply_surround(processed)
         
         if self.audio_8d_enabled:
-            processed = self._apply_8d_audio(processed)
+            report("8d_audio")
+            processed = self._apply_8d_audio(processed, sample_rate)
         
         if self.binaural_enabled:
-            processed = self._apply_binaural(processed)
+            report("binaural")
+            processed = self._apply_binaural(processed, sample_rate)
         
         if self.bass_boost_enabled:
-            processed = self._apply_bass_boost(processed)
+            report("bass_boost")
+            processed = self._apply_bass_boost(processed, sample_rate)
         
         if self.reverb_enabled:
-            processed = self._apply_reverb(processed)
+            report("reverb")
+            processed = self._apply_reverb(processed, sample_rate)
         
         # Apply volume
+        report("output")
         processed = processed * self.volume
         
-        # Clip to [-1, 1] to avoid distortion
-        processed = np.clip(processed, -1.0, 1.0)
+        # Limit peaks to the ceiling, or hard clip to [-1, 1] with the limiter off
+        if self.limiter_enabled:
+            processed, limiter = processor_effects.apply_limiter(
+                processed, sample_rate, self.limiter_ceiling_db,
+                self.limiter_lookahead_ms, self.limiter_release_ms
+            )
+            self.limiter_gain_reduction_db = limiter.max_gain_reduction_db
+        else:
+            processed = np.clip(processed, -1.0, 1.0)
         
         return processed
     
+    def get_design(self, effect, sample_rate, params):
+        key = (effect, sample_rate, params)
+        with self.design_lock:
+            if key in self.design_cache:
+                self.design_cache.move_to_end(key)
+                return self.design_cache[key]
+        
+        if effect == "equalizer":
+            design = processor_effects.design_equalizer(sample_rate, dict(params))
+        elif effect == "bass_boost":
+            design = processor_effects.design_bass_boost(sample_rate, params)
+        elif effect == "reverb":
+            design = processor_effects.design_reverb(sample_rate, params)
+        else:
+            raise ValueError(f"Unknown effect: {effect}")
+        
+        self.add_design(effect, sample_rate, params, design)
+        return design
+    
+    def add_design(self, effect, sample_rate, params, design):
+        key = (effect, sample_rate, params)
+        with self.design_lock:
+            self.design_cache[key] = design
+            self.design_cache.move_to_end(key)
+            while len(self.design_cache) > self.design_cache_size:
+                self.design_cache.popitem(last=False)
+    
+    def _apply_equalizer(self, audio, sample_rate):
+        gains = self.get_design("equalizer", sample_rate, equalizer_params(self.equalizer_values))
+        return processor_effects.apply_equalizer(audio, sample_rate, self.equalizer_values, gains)
+    
+    def _apply_surround(self, audio):
+        return processor_effects.apply_surround(audio, self.surround_intensity, self.channel_layout)
+    
+    def _apply_8d_audio(self, audio, sample_rate):
+        return processor_effects.apply_8d_audio(audio, sample_rate, self.audio_8d_speed, self.channel_layout)
+    
+    def _apply_binaural(self, audio, sample_rate):
+        # One render at a time advances the shared oscillators
+        with self.binaural_lock:
+            return processor_effects.apply_binaural(
+                audio, sample_rate, self.binaural_freq, self.channel_layout, oscillators=self.binaural_oscillators
+            )
+    
+    def reset_binaural(self):
+        # Start the next render at the current beat frequency instead of gliding from the old one
+        with self.binaural_lock:
+            left_osc, right_osc = self.binaural_oscillators
+            right_osc.set_frequency(left_osc.target_frequency + self.binaural_freq)
+            for oscillator in self.binaural_oscillators:
+                oscillator.reset()
+    
+    def _apply_bass_boost(self, audio, sample_rate):
+        design = self.get_design("bass_boost", sample_rate, self.bass_boost_amount)
+        return processor_effects.apply_bass_boost(audio, sample_rate, self.bass_boost_amount, design)
+    
+    def _apply_reverb(self, audio, sample_rate):
+        design = self.get_design("reverb", sample_rate, self.reverb_amount)
+        return processor_effects.apply_reverb(audio, sample_rate, self.reverb_amount, design)
+    
     def set_volume(self, volume):
         self.volume = volume
+        self.settings_version += 1
+    
+    def normalize_loudness(self, target_lufs=-14.0):
+        # Set the volume from the load-time analysis, no extra pass over the audio
+        gain = loudness.normalization_gain(self.analysis, target_lufs)
+        if gain is not None:
+            self.set_volume(gain)
+        return gain
     
     def set_equalizer(self, values):
         self.equalizer_values = values
+        self.settings_version += 1
     
     def set_surround(self, enabled, intensity):
         self.surround_enabled = enabled
         self.surround_intensity = intensity
+        self.settings_version += 1
     
     def set_8d_audio(self, enabled, speed):
         self.audio_8d_enabled = enabled
         self.audio_8d_speed = speed
+        self.settings_version += 1
     
     def set_binaural(self, enabled, freq):
         self.binaural_enabled = enabled
         self.binaural_freq = freq
+        self.settings_version += 1
     
     def set_bass_boost(self, enabled, amount):
         self.bass_boost_enabled = enabled
         self.bass_boost_amount = amount
+        self.settings_version += 1
     
     def set_reverb(self, enabled, amount):
         self.reverb_enabled = enabled
         self.reverb_amount = amount
+        self.settings_version += 1
+    
+    def set_limiter(self, enabled, ceiling_db=None, lookahead_ms=None, release_ms=None):
+        self.limiter_enabled = enabled
+        if ceiling_db is not None:
+            self.limiter_ceiling_db = ceiling_db
+        if lookahead_ms is not None:
+            self.limiter_lookahead_ms = lookahead_ms
+        if release_ms is not None:
+            self.limiter_release_ms = release_ms
+        self.settings_version += 1
+    
+    def set_preview(self, enabled, rate=None, start=None, duration=None, loop=None):
+        self.preview_enabled = enabled
+        if rate is not None and rate != self.preview_rate:
+            # A different proxy rate needs a new proxy
+            self.preview_rate = rate
+            self.preview_audio = None
+            self.preview_sample_rate = None
+        if start is not None:
+            self.preview_start = start
+        if loop is not None:
+            self.preview_loop = loop
+        self.preview_duration = duration
+    
+    def set_channel_layout(self, layout):
+        # One of processor_effects.CHANNEL_LAYOUTS, or None to detect from the channel count
+        if layout is not None and layout not in processor_effects.CHANNEL_LAYOUTS:
+            raise ValueError(f"Unknown channel layout: {layout}")
+        self.channel_layout = layout
+        self.settings_version += 1
     
     def reset_effects(self):
         self.surround_enabled = False
@@ -182,23 +418,32 @@ class AudioProcessor:
         self.binaural_enabled = False
         self.bass_boost_enabled = False
         self.reverb_enabled = False
+        self.settings_version += 1
     
-    def save_file(self, output_path):
+    def save_file(self, output_path, progress=None):
         if self.audio_data is None:
             return
         
+        # Processing is reported as the first 90% of the work, writing as the rest
+        def processing_progress(stage, fraction):
+            progress(stage, 0.9 * fraction)
+        
         # Apply all processing
-        processed_audio = self._apply_all_processing()
+        processed_audio = self._apply_all_processing(progress=processing_progress if progress else None)
         
         # Save using soundfile
+        if progress is not None:
+            progress("writing", 0.9)
         sf.write(output_path, processed_audio, self.sample_rate)
+        if progress is not None:
+            progress("written", 1.0)
     
     def get_visualization_data(self):
         if self.audio_data is None:
             return np.zeros(1000)
         
         # Get a representative sample of the audio for visualization
-        # We'll use the average of left and right channels
+        # We'll use the average of all channels
         mono_data = np.mean(self.audio_data, axis=1)
         
         # Downsample to 1000 points for visualization
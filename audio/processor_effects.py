@@ -1,106 +1,165 @@
 import numpy as np
 from scipy import signal
+from audio.oscillator import SineOscillator
+from audio.limiter import LookaheadLimiter
 
-def apply_equalizer(audio, sample_rate, equalizer_values):
+# Channel orders for the supported layouts (WAV/SMPTE ordering)
+CHANNEL_LAYOUTS = {
+    "mono": ["FC"],
+    "stereo": ["FL", "FR"],
+    "quad": ["FL", "FR", "BL", "BR"],
+    "5.1": ["FL", "FR", "FC", "LFE", "BL", "BR"],
+    "7.1": ["FL", "FR", "FC", "LFE", "BL", "BR", "SL", "SR"],
+}
+
+# Frame size of the FFT equalizer
+EQ_FFT_SIZE = 2048
+
+# Left/right speaker pairs the spatial effects work on
+STEREO_PAIRS = [("FL", "FR"), ("BL", "BR"), ("SL", "SR")]
+
+def get_channel_layout(num_channels, layout=None):
+    # Use the requested layout if it matches, otherwise pick one by channel count
+    if layout is not None and len(CHANNEL_LAYOUTS[layout]) == num_channels:
+        return CHANNEL_LAYOUTS[layout]
+    for labels in CHANNEL_LAYOUTS.values():
+        if len(labels) == num_channels:
+            return labels
+    
+    # Unknown layout: treat the first two channels as front left/right
+    return ["FL", "FR"][:num_channels] + [None] * max(0, num_channels - 2)
+
+def get_stereo_pairs(num_channels, layout=None):
+    # Returns index arrays of the left and right channel of every speaker pair
+    labels = get_channel_layout(num_channels, layout)
+    left = []
+    right = []
+    for left_label, right_label in STEREO_PAIRS:
+        if left_label in labels and right_label in labels:
+            left.append(labels.index(left_label))
+            right.append(labels.index(right_label))
+    return np.array(left, dtype=int), np.array(right, dtype=int)
+
+def downmix_to_stereo(audio, layout=None):
+    # Fold surround channels into stereo for playback devices (LFE is dropped)
+    if audio.shape[1] <= 2:
+        return audio
+    
+    labels = get_channel_layout(audio.shape[1], layout)
+    matrix = np.zeros((audio.shape[1], 2))
+    for index, label in enumerate(labels):
+        if label == "FL":
+            matrix[index, 0] = 1.0
+        elif label == "FR":
+            matrix[index, 1] = 1.0
+        elif label == "FC":
+            matrix[index] = np.sqrt(0.5)
+        elif label in ("BL", "SL"):
+            matrix[index, 0] = np.sqrt(0.5)
+        elif label in ("BR", "SR"):
+            matrix[index, 1] = np.sqrt(0.5)
+    
+    # Keep the loudest possible sum within the original range
+    matrix /= max(1.0, matrix.sum(axis=0).max())
+    return audio @ matrix
+
+def design_equalizer(sample_rate, equalizer_values, fft_size=EQ_FFT_SIZE):
+    # Combined gain of all bands for every FFT bin
+    n_bins = fft_size // 2 + 1
+    gains = np.ones(n_bins)
+    freq_resolution = sample_rate / fft_size
+    
+    for band_freq, gain_db in equalizer_values.items():
+        # Convert gain from dB to linear
+        gain_linear = 10 ** (gain_db / 20)
+        
+        # Calculate frequency bin index and band width (one octave)
+        band_idx = int(band_freq / freq_resolution)
+        band_width = band_idx
+        
+        bins = np.arange(max(0, band_idx - band_width), min(n_bins, band_idx + band_width))
+        if len(bins) == 0:
+            continue
+        
+        # Apply gain with a smooth raised-cosine transition around the center frequency
+        dist = (bins - band_idx) / band_width
+        transition = 0.5 * (1 + np.cos(dist * np.pi))
+        gains[bins] *= transition * (gain_linear - 1) + 1
+    
+    return gains
+
+def apply_equalizer(audio, sample_rate, equalizer_values, gains=None):
     # Skip if no audio data
     if audio is None or len(audio) == 0:
         return audio
     
     # Get FFT of audio
-    fft_size = 2048
+    fft_size = EQ_FFT_SIZE
     hop_size = fft_size // 4
+    overlap = fft_size // hop_size
     
-    # Process each channel
-    result = np.zeros_like(audio)
+    output = np.zeros_like(audio)
+    n_samples, n_channels = audio.shape
+    if n_samples <= fft_size:
+        return output
     
-    for channel in range(audio.shape[1]):
-        # Get channel data
-        channel_data = audio[:, channel]
-        
-        # Create empty output
-        output = np.zeros_like(channel_data)
+    window = signal.windows.hann(fft_size)
+    if gains is None:
+        gains = design_equalizer(sample_rate, equalizer_values, fft_size)
+    
+    # Strided view of every frame for all channels at once: (frame, channel, sample)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, fft_size, axis=0)
+    frames = frames[0:n_samples - fft_size:hop_size]
+    
+    # Process a bounded number of frames at a time to limit memory use
+    chunk_frames = 64 * overlap
+    for chunk_start in range(0, len(frames), chunk_frames):
+        chunk = frames[chunk_start:chunk_start + chunk_frames] * window
         
-        # Process in frames
-        for frame_start in range(0, len(channel_data) - fft_size, hop_size):
-            # Get frame data
-            frame = channel_data[frame_start:frame_start + fft_size]
-            
-            # Apply window
-            window = signal.windows.hann(fft_size)
-            frame = frame * window
-            
-            # Calculate FFT
-            frame_fft = np.fft.rfft(frame)
-            
-            # Apply EQ
-            freq_resolution = sample_rate / fft_size
-            for band_freq, gain_db in equalizer_values.items():
-                # Convert gain from dB to linear
-                gain_linear = 10 ** (gain_db / 20)
-                
-                # Calculate frequency bin indices
-                band_idx = int(band_freq / freq_resolution)
-                
-                # Calculate band width (one octave)
-                band_width = band_idx
-                
-                # Apply gain to frequency range (with smooth transition)
-                for i in range(max(0, band_idx - band_width), min(len(frame_fft), band_idx + band_width)):
-                    # Calculate distance from center frequency (normalized to [-1, 1])
-                    dist = (i - band_idx) / band_width
-                    
-                    # Apply smooth transition based on distance
-                    transition = 0.5 * (1 + np.cos(dist * np.pi))
-                    
-                    # Apply gain
-                    frame_fft[i] *= transition * (gain_linear - 1) + 1
-            
-            # Inverse FFT
-            frame_processed = np.fft.irfft(frame_fft)
-            
-            # Apply window again
-            frame_processed = frame_processed * window
-            
-            # Overlap-add to output
-            output[frame_start:frame_start + fft_size] += frame_processed
+        # Filter every frame and channel in one batched FFT
+        chunk_fft = np.fft.rfft(chunk, axis=-1)
+        chunk_fft *= gains
+        processed = np.fft.irfft(chunk_fft, n=fft_size, axis=-1) * window
         
-        # Normalize
-        result[:, channel] = output / (fft_size / hop_size)
+        # Overlap-add: every overlap-th frame tiles the output without overlapping itself
+        for offset in range(min(overlap, len(processed))):
+            tiles = processed[offset::overlap]
+            start = (chunk_start + offset) * hop_size
+            length = len(tiles) * fft_size
+            output[start:start + length] += tiles.transpose(0, 2, 1).reshape(length, n_channels)
     
-    return result
+    # Normalize
+    return output / overlap
 
-def apply_surround(audio, intensity):
+def apply_surround(audio, intensity, layout=None):
     # Skip if no audio data or mono
     if audio is None or audio.shape[1] < 2:
         return audio
     
-    # Apply different filter to left and right channel
-    left = audio[:, 0]
-    right = audio[:, 1]
-    
-    # Create filtered copies
-    b, a = signal.butter(2, 0.5, btype='lowpass')
-    left_low = signal.filtfilt(b, a, left)
-    right_low = signal.filtfilt(b, a, right)
+    left, right = get_stereo_pairs(audio.shape[1], layout)
+    if len(left) == 0:
+        return audio
     
+    # High-pass every left/right channel in one pass along the time axis
     b, a = signal.butter(2, 0.5, btype='highpass')
-    left_high = signal.filtfilt(b, a, left)
-    right_high = signal.filtfilt(b, a, right)
+    left_high = signal.filtfilt(b, a, audio[:, left], axis=0)
+    right_high = signal.filtfilt(b, a, audio[:, right], axis=0)
     
     # Mix channels with phase-shifted versions
-    result = np.zeros_like(audio)
-    result[:, 0] = left + intensity * right_high - intensity * left_high
-    result[:, 1] = right + intensity * left_high - intensity * right_high
+    result = np.copy(audio)
+    result[:, left] = audio[:, left] + intensity * right_high - intensity * left_high
+    result[:, right] = audio[:, right] + intensity * left_high - intensity * right_high
     
     return result
 
-def apply_8d_audio(audio, sample_rate, speed):
+def apply_8d_audio(audio, sample_rate, speed, layout=None):
     # Skip if no audio data or mono
     if audio is None or audio.shape[1] < 2:
         return audio
     
-    # Create output
-    result = np.zeros_like(audio)
+    left, right = get_stereo_pairs(audio.shape[1], layout)
+    if len(left) == 0:
+        return audio
     
     # Calculate pan based on time
     num_samples = audio.shape[0]
@@ -111,56 +170,54 @@ def apply_8d_audio(audio, sample_rate, speed):
     cycles = duration * speed / 60  # cycles per minute to cycles per duration
     pan = 0.5 + 0.5 * np.sin(2 * np.pi * cycles * t)
     
-    # Apply pan
-    for i in range(num_samples):
-        # Calculate left/right gain
-        left_gain = np.sqrt(1 - pan[i])
-        right_gain = np.sqrt(pan[i])
-        
-        # Apply to both channels
-        result[i, 0] = audio[i, 0] * left_gain
-        result[i, 1] = audio[i, 1] * right_gain
+    # Apply pan to every speaker pair
+    result = np.copy(audio)
+    result[:, left] = audio[:, left] * np.sqrt(1 - pan)[:, np.newaxis]
+    result[:, right] = audio[:, right] * np.sqrt(pan)[:, np.newaxis]
     
     return result
 
-def apply_binaural(audio, sample_rate, beat_freq):
+def create_binaural_oscillators(beat_freq, base_freq=200, amplitude=0.2):
+    # Left ear plays the base frequency, right ear is offset by the beat frequency
+    return (SineOscillator(base_freq, amplitude),
+            SineOscillator(base_freq + beat_freq, amplitude))
+
+def apply_binaural(audio, sample_rate, beat_freq, layout=None, oscillators=None, block_size=65536):
     # Skip if no audio data
     if audio is None:
         return audio
     
-    # Create a copy
-    result = np.copy(audio)
-    
-    # Get parameters
-    base_freq = 200  # Base frequency in Hz
+    # Passing the same oscillators for consecutive chunks continues their phase
+    if oscillators is None:
+        oscillators = create_binaural_oscillators(beat_freq)
+    else:
+        left_osc, right_osc = oscillators
+        right_osc.set_frequency(left_osc.target_frequency + beat_freq)
+    left_osc, right_osc = oscillators
     
-    # Calculate frequencies for left and right ear
-    left_freq = base_freq
-    right_freq = base_freq + beat_freq
+    # Convert mono to stereo
+    if audio.shape[1] < 2:
+        audio = np.column_stack((audio[:, 0], audio[:, 0]))
+        front_left, front_right = 0, 1
+    else:
+        labels = get_channel_layout(audio.shape[1], layout)
+        front_left = labels.index("FL") if "FL" in labels else 0
+        front_right = labels.index("FR") if "FR" in labels else 1
     
-    # Create sine waves
-    t = np.arange(audio.shape[0]) / sample_rate
-    left_sine = 0.2 * np.sin(2 * np.pi * left_freq * t)
-    right_sine = 0.2 * np.sin(2 * np.pi * right_freq * t)
+    # Attenuate the program, the carrier goes to the front pair
+    result = audio * 0.8
     
-    # Apply to audio
-    if audio.shape[1] >= 2:
-        result[:, 0] = result[:, 0] * 0.8 + left_sine
-        result[:, 1] = result[:, 1] * 0.8 + right_sine
-    else:
-        # If mono, convert to stereo
-        stereo = np.zeros((audio.shape[0], 2))
-        stereo[:, 0] = audio[:, 0] * 0.8 + left_sine
-        stereo[:, 1] = audio[:, 0] * 0.8 + right_sine
-        result = stereo
+    # Generate the carrier block by block so memory does not grow with track length
+    carrier = np.empty(min(block_size, audio.shape[0]))
+    for block_start in range(0, audio.shape[0], block_size):
+        block_end = min(block_start + block_size, audio.shape[0])
+        block = carrier[:block_end - block_start]
+        result[block_start:block_end, front_left] += left_osc.render(len(block), sample_rate, out=block)
+        result[block_start:block_end, front_right] += right_osc.render(len(block), sample_rate, out=block)
     
     return result
 
-def apply_bass_boost(audio, sample_rate, amount):
-    # Skip if no audio data
-    if audio is None:
-        return audio
-    
+def design_bass_boost(sample_rate, amount):
     # Design a bass boost filter
     cutoff = 150 / (sample_rate / 2)  # Normalized cutoff frequency
     gain_db = 12 * amount  # Max gain = 12dB
@@ -170,23 +227,24 @@ def apply_bass_boost(audio, sample_rate, amount):
     
     # Create a low-shelf filter
     b, a = signal.butter(2, cutoff, btype='lowpass')
-    
-    # Apply filter to each channel
-    result = np.zeros_like(audio)
-    for channel in range(audio.shape[1]):
-        # Get the low frequencies
-        low_freq = signal.filtfilt(b, a, audio[:, channel])
-        
-        # Boost low frequencies
-        result[:, channel] = audio[:, channel] + (gain - 1) * low_freq
-    
-    return result
+    return b, a, gain
 
-def apply_reverb(audio, sample_rate, amount):
+def apply_bass_boost(audio, sample_rate, amount, design=None):
     # Skip if no audio data
     if audio is None:
         return audio
     
+    if design is None:
+        design = design_bass_boost(sample_rate, amount)
+    b, a, gain = design
+    
+    # Get the low frequencies of all channels in one pass along the time axis
+    low_freq = signal.filtfilt(b, a, audio, axis=0)
+    
+    # Boost low frequencies
+    return audio + (gain - 1) * low_freq
+
+def design_reverb(sample_rate, amount):
     # Design a simple reverb effect
     delay_ms = int(50 + 150 * amount)  # 50-200ms
     decay = 0.3 + 0.6 * amount  # 0.3-0.9
@@ -194,17 +252,50 @@ def apply_reverb(audio, sample_rate, amount):
     # Convert delay to samples
     delay_samples = int(delay_ms * sample_rate / 1000)
     
+    # Multiple delays with decreasing amplitude
+    n_delays = 5
+    taps = np.arange(1, n_delays + 1)
+    return taps * delay_samples, decay ** taps
+
+def apply_reverb(audio, sample_rate, amount, design=None):
+    # Skip if no audio data
+    if audio is None:
+        return audio
+    
+    if design is None:
+        design = design_reverb(sample_rate, amount)
+    
     # Create output
     result = np.copy(audio)
     
-    # Apply multiple delays with decreasing amplitude
-    n_delays = 5
-    for i in range(1, n_delays + 1):
-        delay = i * delay_samples
-        amplitude = decay ** i
+    for delay, amplitude in zip(*design):
+        delay = int(delay)
         
         # Add delayed signal
         if delay < audio.shape[0]:
             result[delay:] += amplitude * audio[:-delay]
     
-    return result
\ No newline at end of file
+    return result
+
+def apply_limiter(audio, sample_rate, ceiling_db=-0.3, lookahead_ms=5.0, release_ms=150.0, block_size=65536):
+    # Returns the limited audio and the limiter (for its gain reduction meter)
+    limiter = LookaheadLimiter(sample_rate, ceiling_db, lookahead_ms, release_ms)
+    if audio is None or len(audio) == 0:
+        return audio, limiter
+    
+    # Stream through in blocks, then drop the lookahead latency so the output lines up with the input
+    result = np.empty_like(audio)
+    latency = limiter.latency
+    for block_start in range(0, audio.shape[0], block_size):
+        block = limiter.process(audio[block_start:block_start + block_size])
+        out_start = block_start - latency
+        if out_start < 0:
+            block = block[-out_start:]
+            out_start = 0
+        result[out_start:out_start + len(block)] = block
+    
+    tail = limiter.flush()
+    tail_start = max(0, audio.shape[0] - latency)
+    result[tail_start:] = tail[len(tail) - (audio.shape[0] - tail_start):]
+    
+    return result, limiter
\ No newline at end of file
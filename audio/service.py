@@ -0,0 +1,335 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from audio import presets
+from audio.processor import AudioProcessor
+
+# Each worker process keeps one AudioProcessor (and its design cache) for all its jobs
+_worker_processor = None
+_worker_defaults = None
+_worker_progress = None
+
+def _init_worker(progress_queue):
+    global _worker_processor, _worker_defaults, _worker_progress
+    _worker_processor = AudioProcessor()
+    _worker_defaults = presets.capture_settings(_worker_processor)
+    _worker_progress = progress_queue
+
+def _report(job_id, stage, progress):
+    if _worker_progress is not None:
+        _worker_progress.put((job_id, stage, progress))
+
+def render_job(job_id, input_path, output_path, settings, preset_path=None, target_lufs=None):
+    try:
+        return _render(job_id, input_path, output_path, settings, preset_path, target_lufs)
+    finally:
+        # Marks the end of this job's progress messages so the service can publish the result after them
+        _report(job_id, None, None)
+
+def _render(job_id, input_path, output_path, settings, preset_path, target_lufs):
+    processor = _worker_processor
+    if processor is None:
+        _init_worker(None)
+        processor = _worker_processor
+    
+    _report(job_id, "decoding", 0.0)
+    processor.load_file(input_path)
+    
+    # Start from defaults so nothing leaks over from the previous job, then layer preset and overrides
+    job_settings = json.loads(json.dumps(_worker_defaults))
+    if preset_path is not None:
+        preset = presets.load_preset(preset_path)
+        presets.apply_preset(processor, preset)
+        job_settings = presets.capture_settings(processor)
+    for key, value in (settings or {}).items():
+        if isinstance(value, dict) and isinstance(job_settings.get(key), dict):
+            job_settings[key].update(value)
+        else:
+            job_settings[key] = value
+    presets.apply_settings(processor, job_settings)
+    
+    if target_lufs is not None:
+        processor.normalize_loudness(target_lufs)
+    
+    # Decoding and setup count as the first 20%, the render and write as the rest
+    def save_progress(stage, fraction):
+        _report(job_id, stage, 0.2 + 0.8 * fraction)
+    
+    processor.save_file(output_path, progress=save_progress)
+    
+    return {"output": output_path, "duration": processor.analysis["duration"] if processor.analysis else None}
+
+class RenderService:
+    def __init__(self, max_workers=2, render_function=render_job, executor=None, history_size=1000,
+                 progress_queue=None):
+        self.max_workers = max_workers
+        self.render_function = render_function
+        
+        # Tests can hand in a thread pool and a stand-in render function, plus a queue.Queue it reports
+        # (job_id, stage, progress) to, ending each job with (job_id, None, None) like render_job does
+        self.progress_queue = progress_queue
+        if executor is None:
+            self.progress_queue = multiprocessing.Queue()
+            executor = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(self.progress_queue,))
+        self.executor = executor
+        
+        self.queue = None
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.server = None
+        self.tasks = []
+        
+        # Metrics
+        self.started_at = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=history_size)
+        self.completion_times = deque(maxlen=history_size)
+    
+    async def start(self, host="127.0.0.1", port=8765, unix_socket=None):
+        self.queue = asyncio.PriorityQueue()
+        self.started_at = time.monotonic()
+        
+        if unix_socket is not None:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=unix_socket)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, host, port)
+        
+        # One dispatcher per worker keeps the pool busy without queueing inside it
+        self.tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.max_workers)]
+        if self.progress_queue is not None:
+            self.tasks.append(asyncio.create_task(self._forward_progress()))
+        return self.server
+    
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        
+        if self.progress_queue is not None:
+            self.progress_queue.put(None)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+    
+    def submit(self, request, writer=None):
+        # Validate before registering anything, so a bad request leaves no job behind
+        for key in ("input", "output"):
+            if not isinstance(request.get(key), str) or not request[key]:
+                raise ValueError(f"'{key}' must be a non-empty path")
+        priority = request.get("priority", 0)
+        if isinstance(priority, bool) or not isinstance(priority, (int, float)):
+            raise ValueError("'priority' must be a number")
+        if not isinstance(request.get("settings", {}), dict):
+            raise ValueError("'settings' must be an object")
+        target_lufs = request.get("target_lufs")
+        if target_lufs is not None and (isinstance(target_lufs, bool) or not isinstance(target_lufs, (int, float))):
+            raise ValueError("'target_lufs' must be a number")
+        
+        job_id = next(self.job_ids)
+        job = {
+            "id": job_id,
+            "input": request["input"],
+            "output": request["output"],
+            "settings": request.get("settings", {}),
+            "preset": request.get("preset"),
+            "target_lufs": request.get("target_lufs"),
+            "priority": priority,
+            "submitted": time.monotonic(),
+            "status": "queued",
+            "subscribers": [writer] if writer is not None else [],
+            "progress_done": asyncio.Event(),
+        }
+        self.jobs[job_id] = job
+        
+        # Higher priority first, FIFO within a priority
+        self.queue.put_nowait((-job["priority"], job_id))
+        return job
+    
+    def get_metrics(self):
+        latencies = sorted(self.latencies)
+        
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+        
+        # Throughput over the last minute (or since start if shorter)
+        now = time.monotonic()
+        window = min(60.0, max(1e-9, now - self.started_at)) if self.started_at else 60.0
+        recent = sum(1 for finished in self.completion_times if now - finished <= window)
+        
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_p50": percentile(0.5),
+            "latency_p90": percentile(0.9),
+            "latency_p99": percentile(0.99),
+            "throughput_per_min": recent * 60.0 / window,
+        }
+    
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, job_id = await self.queue.get()
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            self.running += 1
+            await self._publish(job, {"event": "started"})
+            
+            try:
+                result = await loop.run_in_executor(
+                    self.executor, self.render_function, job_id, job["input"], job["output"],
+                    job["settings"], job["preset"], job["target_lufs"]
+                )
+            except Exception as e:
+                await self._wait_for_progress(job)
+                job["status"] = "failed"
+                self.failed += 1
+                await self._publish(job, {"event": "failed", "error": str(e)})
+            else:
+                await self._wait_for_progress(job)
+                job["status"] = "completed"
+                self.completed += 1
+                finished = time.monotonic()
+                self.latencies.append(finished - job["submitted"])
+                self.completion_times.append(finished)
+                await self._publish(job, {"event": "completed", "result": result,
+                                          "latency": finished - job["submitted"]})
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+            
+            # Finished jobs only need to live as long as their events
+            del self.jobs[job_id]
+    
+    async def _wait_for_progress(self, job):
+        # Progress travels on a separate queue; let the worker's last messages through before the result
+        if self.progress_queue is None:
+            return
+        try:
+            await asyncio.wait_for(job["progress_done"].wait(), 5.0)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _forward_progress(self):
+        # Relay stage updates reported by the worker processes
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, self.progress_queue.get)
+            if message is None:
+                return
+            job_id, stage, progress = message
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            if stage is None:
+                job["progress_done"].set()
+            else:
+                await self._publish(job, {"event": "progress", "stage": stage, "progress": progress})
+    
+    async def _publish(self, job, event):
+        event = dict(event, job_id=job["id"])
+        for writer in list(job["subscribers"]):
+            try:
+                await _send(writer, event)
+            except (ConnectionError, RuntimeError):
+                job["subscribers"].remove(writer)
+    
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                
+                try:
+                    request = json.loads(line)
+                    kind = request.get("type")
+                    if kind == "submit":
+                        job = self.submit(request, writer)
+                        await _send(writer, {"event": "queued", "job_id": job["id"],
+                                             "queue_depth": self.queue.qsize()})
+                    elif kind == "metrics":
+                        await _send(writer, dict(self.get_metrics(), event="metrics"))
+                    else:
+                        await _send(writer, {"event": "error", "error": f"Unknown request type: {kind}"})
+                except (ValueError, TypeError, KeyError, AttributeError) as e:
+                    await _send(writer, {"event": "error", "error": f"Bad request: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            # Stop sending events for this connection's jobs
+            for job in self.jobs.values():
+                if writer in job["subscribers"]:
+                    job["subscribers"].remove(writer)
+            writer.close()
+
+async def _send(writer, message):
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+
+class RenderClient:
+    # Minimal client for the newline-delimited JSON protocol, used by tools and for local testing
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        
+        # Events read while waiting for something else (e.g. another job's progress)
+        self.buffered = deque()
+    
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, unix_socket=None):
+        if unix_socket is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_socket)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+    
+    async def submit(self, input_path, output_path, settings=None, priority=0, preset=None, target_lufs=None):
+        await _send(self.writer, {
+            "type": "submit", "input": input_path, "output": output_path,
+            "settings": settings or {}, "priority": priority, "preset": preset, "target_lufs": target_lufs,
+        })
+        return await self._next_event(lambda event: event["event"] in ("queued", "error"))
+    
+    async def metrics(self):
+        await _send(self.writer, {"type": "metrics"})
+        return await self._next_event(lambda event: event["event"] in ("metrics", "error"))
+    
+    async def wait(self, job_id):
+        # Yields this job's events until it completes or fails
+        while True:
+            event = await self._next_event(lambda event: event.get("job_id") == job_id)
+            if event is None:
+                return
+            yield event
+            if event["event"] in ("completed", "failed"):
+                return
+    
+    async def _next_event(self, matches):
+        for event in self.buffered:
+            if matches(event):
+                self.buffered.remove(event)
+                return event
+        
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return None
+            event = json.loads(line)
+            if matches(event):
+                return event
+            self.buffered.append(event)
+    
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
\ No newline at end of file
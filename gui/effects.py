@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
+from audio.processor_effects import CHANNEL_LAYOUTS
 
 class EffectsFrame(ttk.Frame):
     def __init__(self, parent, audio_processor):
@@ -74,6 +75,16 @@ class EffectsFrame(ttk.Frame):
         )
         binaural_freq.grid(row=2, column=2, padx=5, pady=5)
         
+        # Speaker layout for multichannel files
+        ttk.Label(spatial_frame, text="Channel Layout:").grid(row=3, column=0, padx=10, pady=5, sticky=tk.W)
+        self.channel_layout_var = tk.StringVar(value="Auto")
+        channel_layout = ttk.Combobox(
+            spatial_frame, textvariable=self.channel_layout_var, state="readonly",
+            values=["Auto"] + list(CHANNEL_LAYOUTS)
+        )
+        channel_layout.grid(row=3, column=2, padx=5, pady=5, sticky=tk.W)
+        channel_layout.bind("<<ComboboxSelected>>", self.update_channel_layout)
+        
         # Bass boost
         self.bass_boost_var = tk.BooleanVar(value=False)
         bass_boost_check = ttk.Checkbutton(
@@ -108,6 +119,23 @@ class EffectsFrame(ttk.Frame):
         )
         reverb_amount.grid(row=1, column=2, padx=5, pady=5)
         
+        # Output limiter
+        self.limiter_var = tk.BooleanVar(value=True)
+        limiter_check = ttk.Checkbutton(
+            dynamics_frame, text="Output Limiter", variable=self.limiter_var,
+            command=self.update_limiter
+        )
+        limiter_check.grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
+        
+        # Limiter release
+        ttk.Label(dynamics_frame, text="Release (ms):").grid(row=2, column=1, padx=5, pady=5)
+        self.limiter_release_var = tk.DoubleVar(value=150)
+        limiter_release = ttk.Scale(
+            dynamics_frame, from_=20, to=1000, orient=tk.HORIZONTAL, length=200,
+            variable=self.limiter_release_var, command=self.update_limiter_release
+        )
+        limiter_release.grid(row=2, column=2, padx=5, pady=5)
+        
         # Reset button
         ttk.Button(
             effects_container, text="Reset All Effects",
@@ -144,6 +172,10 @@ class EffectsFrame(ttk.Frame):
             freq = self.binaural_freq_var.get()
             self.audio_processor.set_binaural(True, freq)
     
+    def update_channel_layout(self, *args):
+        layout = self.channel_layout_var.get()
+        self.audio_processor.set_channel_layout(None if layout == "Auto" else layout)
+    
     def update_bass_boost(self):
         enabled = self.bass_boost_var.get()
         amount = self.bass_amount_var.get() / 100
@@ -164,6 +196,33 @@ class EffectsFrame(ttk.Frame):
             amount = self.reverb_amount_var.get() / 100
             self.audio_processor.set_reverb(True, amount)
     
+    def update_limiter(self):
+        enabled = self.limiter_var.get()
+        release = self.limiter_release_var.get()
+        self.audio_processor.set_limiter(enabled, release_ms=release)
+    
+    def update_limiter_release(self, *args):
+        if self.limiter_var.get():
+            release = self.limiter_release_var.get()
+            self.audio_processor.set_limiter(True, release_ms=release)
+    
+    def sync_from_processor(self):
+        # Show the processor's current effect settings (e.g. after loading a preset file)
+        processor = self.audio_processor
+        self.surround_var.set(processor.surround_enabled)
+        self.surround_intensity_var.set(processor.surround_intensity * 100)
+        self.audio_8d_var.set(processor.audio_8d_enabled)
+        self.audio_8d_speed_var.set(processor.audio_8d_speed)
+        self.binaural_var.set(processor.binaural_enabled)
+        self.binaural_freq_var.set(processor.binaural_freq)
+        self.bass_boost_var.set(processor.bass_boost_enabled)
+        self.bass_amount_var.set(processor.bass_boost_amount * 100)
+        self.reverb_var.set(processor.reverb_enabled)
+        self.reverb_amount_var.set(processor.reverb_amount * 100)
+        self.limiter_var.set(processor.limiter_enabled)
+        self.limiter_release_var.set(processor.limiter_release_ms)
+        self.channel_layout_var.set(processor.channel_layout or "Auto")
+    
     def reset_effects(self):
         # Reset all effects to default state
         self.surround_var.set(False)
@@ -109,6 +109,11 @@ class EqualizerFrame(ttk.Frame):
             self.eq_vars[freq].set(value)
         self.update_all_eq()
     
+    def sync_from_processor(self):
+        # Show the processor's current band gains (e.g. after loading a preset file)
+        for freq in self.freq_bands:
+            self.eq_vars[freq].set(self.audio_processor.equalizer_values.get(freq, 0))
+    
     def update_all_eq(self):
         eq_values = {freq: self.eq_vars[freq].get() for freq in self.freq_bands}
         self.audio_processor.set_equalizer(eq_values)
\ No newline at end of file
@@ -1,8 +1,11 @@
 import tkinter as tk
+import math
 from tkinter import ttk, filedialog
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from audio.processor import AudioProcessor
+from audio.playlist import PlaylistPlayer
+from audio import presets
 from gui.equalizer import EqualizerFrame
 from gui.effects import EffectsFrame
 
@@ -14,6 +17,11 @@ class MainWindow:
         self.root.minsize(800, 500)
         
         self.audio_processor = AudioProcessor()
+        self.playlist = PlaylistPlayer(self.audio_processor)
+        
+        # Two loaded presets for A/B comparison
+        self.preset_slots = {"A": None, "B": None}
+        self.active_slot = None
         
         self.setup_ui()
         
@@ -35,6 +43,44 @@ class MainWindow:
         ttk.Button(file_frame, text="Stop", command=self.stop_audio).pack(side=tk.LEFT, padx=5, pady=5)
         ttk.Button(file_frame, text="Save As", command=self.save_file).pack(side=tk.LEFT, padx=5, pady=5)
         
+        # Preview controls
+        preview_frame = ttk.LabelFrame(top_frame, text="Preview")
+        preview_frame.pack(side=tk.LEFT, padx=5)
+        
+        self.preview_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(preview_frame, text="Fast Preview", variable=self.preview_var,
+                        command=self.update_preview).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.preview_loop_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(preview_frame, text="Loop 15s From", variable=self.preview_loop_var,
+                        command=self.update_preview).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.preview_start_var = tk.DoubleVar(value=0)
+        preview_start = ttk.Spinbox(preview_frame, from_=0, to=3600, increment=5, width=5,
+                                    textvariable=self.preview_start_var, command=self.update_preview)
+        preview_start.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # The command only fires on the arrows; also pick up typed values
+        preview_start.bind("<Return>", self.update_preview)
+        preview_start.bind("<FocusOut>", self.update_preview)
+        
+        # Playlist controls
+        playlist_frame = ttk.LabelFrame(top_frame, text="Playlist")
+        playlist_frame.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(playlist_frame, text="Add Tracks", command=self.add_to_playlist).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(playlist_frame, text="Play Playlist", command=self.play_playlist).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(playlist_frame, text="Clear", command=self.clear_playlist).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # Preset controls
+        preset_frame = ttk.LabelFrame(top_frame, text="Presets")
+        preset_frame.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(preset_frame, text="Save", command=self.save_preset).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(preset_frame, text="Load A", command=lambda: self.load_preset("A")).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(preset_frame, text="Load B", command=lambda: self.load_preset("B")).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(preset_frame, text="A/B", command=self.switch_preset).pack(side=tk.LEFT, padx=5, pady=5)
+        
         # Volume control
         volume_frame = ttk.LabelFrame(top_frame, text="Volume")
         volume_frame.pack(side=tk.RIGHT, padx=5)
@@ -43,6 +89,7 @@ class MainWindow:
         volume_slider = ttk.Scale(volume_frame, from_=0, to=100, orient=tk.HORIZONTAL,
                                  variable=self.volume_var, command=self.update_volume)
         volume_slider.pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(volume_frame, text="Normalize", command=self.normalize_volume).pack(side=tk.LEFT, padx=5, pady=5)
         
         # Visualizer frame
         visualizer_frame = ttk.LabelFrame(main_frame, text="Audio Visualization")
@@ -89,20 +136,48 @@ class MainWindow:
             try:
                 self.audio_processor.load_file(file_path)
                 filename = file_path.split("/")[-1]
-                self.status_var.set(f"Loaded: {filename}")
+                status = f"Loaded: {filename}"
+                analysis = self.audio_processor.analysis
+                if analysis and analysis["integrated_lufs"] is not None:
+                    status += f" ({analysis['integrated_lufs']:.1f} LUFS"
+                    if analysis["true_peak_dbtp"] is not None:
+                        status += f", {analysis['true_peak_dbtp']:.1f} dBTP"
+                    status += ")"
+                self.status_var.set(status)
                 self.update_visualization()
             except Exception as e:
                 self.status_var.set(f"Error loading file: {str(e)}")
     
     def play_audio(self):
         if self.audio_processor.audio_data is not None:
+            self.playlist.stop()
             self.audio_processor.play()
             self.status_var.set("Playing audio...")
     
     def stop_audio(self):
         self.audio_processor.stop()
+        self.playlist.stop()
         self.status_var.set("Playback stopped.")
     
+    def add_to_playlist(self):
+        file_paths = filedialog.askopenfilenames(
+            filetypes=[("Audio Files", "*.mp3 *.wav *.ogg *.flac")]
+        )
+        for file_path in file_paths:
+            self.playlist.add_track(file_path)
+        if file_paths:
+            self.status_var.set(f"Playlist: {len(self.playlist.tracks)} tracks")
+    
+    def play_playlist(self):
+        if self.playlist.tracks:
+            self.audio_processor.stop()
+            self.playlist.play()
+            self.status_var.set(f"Playing playlist ({len(self.playlist.tracks)} tracks)...")
+    
+    def clear_playlist(self):
+        self.playlist.clear()
+        self.status_var.set("Playlist cleared.")
+    
     def save_file(self):
         if self.audio_processor.audio_data is not None:
             file_path = filedialog.asksaveasfilename(
@@ -112,10 +187,73 @@ class MainWindow:
             if file_path:
                 try:
                     self.audio_processor.save_file(file_path)
-                    self.status_var.set(f"Saved to: {file_path}")
+                    status = f"Saved to: {file_path}"
+                    if self.audio_processor.limiter_enabled:
+                        status += f" (limiter: -{self.audio_processor.limiter_gain_reduction_db:.1f} dB peak)"
+                    self.status_var.set(status)
                 except Exception as e:
                     self.status_var.set(f"Error saving file: {str(e)}")
     
+    def save_preset(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Preset files", "*.json"), ("All files", "*.*")]
+        )
+        if file_path:
+            try:
+                name = file_path.split("/")[-1].rsplit(".", 1)[0]
+                presets.save_preset(file_path, self.audio_processor, name=name)
+                self.status_var.set(f"Preset saved to: {file_path}")
+            except Exception as e:
+                self.status_var.set(f"Error saving preset: {str(e)}")
+    
+    def load_preset(self, slot):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Preset files", "*.json"), ("All files", "*.*")]
+        )
+        if file_path:
+            try:
+                self.preset_slots[slot] = presets.load_preset(file_path)
+                self.apply_preset_slot(slot)
+            except Exception as e:
+                self.status_var.set(f"Error loading preset: {str(e)}")
+    
+    def switch_preset(self):
+        slot = "B" if self.active_slot == "A" else "A"
+        if self.preset_slots[slot] is not None:
+            self.apply_preset_slot(slot)
+    
+    def apply_preset_slot(self, slot):
+        preset = self.preset_slots[slot]
+        presets.apply_preset(self.audio_processor, preset)
+        self.active_slot = slot
+        
+        # Update the controls to match
+        self.volume_var.set(self.audio_processor.volume * 100)
+        self.equalizer_frame.sync_from_processor()
+        self.effects_frame.sync_from_processor()
+        self.status_var.set(f"Preset {slot}: {preset.get('name') or 'unnamed'}")
+    
+    def update_preview(self, *args):
+        loop = self.preview_loop_var.get()
+        try:
+            start = self.preview_start_var.get()
+        except tk.TclError:
+            start = 0.0
+        self.audio_processor.set_preview(
+            self.preview_var.get(), start=start, duration=15.0 if loop else None, loop=loop
+        )
+    
+    def normalize_volume(self):
+        gain = self.audio_processor.normalize_loudness()
+        if gain is None:
+            self.status_var.set("Nothing to normalize.")
+            return
+        
+        # The slider only goes up to unity gain
+        self.volume_var.set(min(100, gain * 100))
+        self.status_var.set(f"Volume normalized to -14 LUFS ({20 * math.log10(gain):+.1f} dB)")
+    
     def update_volume(self, *args):
         volume = self.volume_var.get()
         self.audio_processor.set_volume(volume / 100.0)
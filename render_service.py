@@ -0,0 +1,26 @@
+import argparse
+import asyncio
+from audio.service import RenderService
+
+async def serve(args):
+    service = RenderService(max_workers=args.workers)
+    server = await service.start(args.host, args.port, args.socket)
+    where = args.socket or f"{args.host}:{args.port}"
+    print(f"Render service listening on {where} with {args.workers} workers")
+    try:
+        await server.serve_forever()
+    finally:
+        await service.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local audio render service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,61 @@
+import numpy as np
+from audio.limiter import LookaheadLimiter
+from audio.processor_effects import apply_limiter
+
+SAMPLE_RATE = 48000
+CEILING_DB = -0.3
+CEILING = 10 ** (CEILING_DB / 20)
+
+def loud_signal(length, channels=2, seed=0):
+    # Noise with sharp transients well above full scale
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 0.5, (length, channels))
+    audio[rng.integers(0, length, length // 500)] *= 8
+    return audio
+
+def test_output_stays_under_ceiling_for_any_block_size():
+    audio = loud_signal(SAMPLE_RATE * 2)
+    
+    for block_size in (17, 1000, 65536):
+        limited, limiter = apply_limiter(audio, SAMPLE_RATE, CEILING_DB, block_size=block_size)
+        assert limited.shape == audio.shape
+        assert np.max(np.abs(limited)) <= CEILING + 1e-9
+        assert limiter.max_gain_reduction_db > 0
+
+def test_result_does_not_depend_on_block_size():
+    audio = loud_signal(20000, seed=1)
+    
+    reference, _ = apply_limiter(audio, SAMPLE_RATE, CEILING_DB, block_size=65536)
+    for block_size in (17, 1000):
+        limited, _ = apply_limiter(audio, SAMPLE_RATE, CEILING_DB, block_size=block_size)
+        np.testing.assert_allclose(limited, reference, atol=1e-12)
+
+def test_quiet_input_passes_through_unchanged():
+    rng = np.random.default_rng(2)
+    
+    # Includes lengths shorter and longer than the lookahead, so the latency has to line up exactly
+    for length in range(1, 301):
+        audio = rng.uniform(-0.5, 0.5, (length, 2))
+        limited, limiter = apply_limiter(audio, SAMPLE_RATE, CEILING_DB, lookahead_ms=1.0, block_size=64)
+        np.testing.assert_array_equal(limited, audio)
+        assert limiter.max_gain_reduction_db == 0
+
+def test_input_shorter_than_lookahead_is_limited():
+    audio = loud_signal(10, channels=1, seed=3) * 4
+    
+    limited, limiter = apply_limiter(audio, SAMPLE_RATE, CEILING_DB, lookahead_ms=5.0)
+    assert limiter.latency > len(audio)
+    assert limited.shape == audio.shape
+    assert np.max(np.abs(limited)) <= CEILING + 1e-9
+
+def test_streaming_output_is_delayed_by_latency():
+    rng = np.random.default_rng(4)
+    audio = rng.uniform(-0.5, 0.5, (1000, 2))
+    limiter = LookaheadLimiter(SAMPLE_RATE, CEILING_DB)
+    
+    output = np.concatenate([limiter.process(audio[start:start + 300]) for start in range(0, 1000, 300)]
+                            + [limiter.flush()])
+    
+    assert len(output) == len(audio) + limiter.latency
+    assert not output[:limiter.latency].any()
+    np.testing.assert_array_equal(output[limiter.latency:], audio)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pytest
+from scipy import signal
+from audio.loudness import CACHE_SUFFIX, analyze_audio, design_k_weighting, get_analysis
+
+# ITU-R BS.1770-4 K-weighting coefficients at 48 kHz
+REFERENCE_SHELF_B = [1.53512485958697, -2.69169618940638, 1.19839281085285]
+REFERENCE_SHELF_A = [1.0, -1.69065929318241, 0.73248077421585]
+REFERENCE_HIGHPASS_B = [1.0, -2.0, 1.0]
+REFERENCE_HIGHPASS_A = [1.0, -1.99004745483398, 0.99007225036621]
+
+def test_k_weighting_coefficients_match_reference_at_48k():
+    sos = design_k_weighting(48000)
+    
+    np.testing.assert_allclose(sos[0, :3], REFERENCE_SHELF_B, atol=5e-4)
+    np.testing.assert_allclose(sos[0, 3:], REFERENCE_SHELF_A, atol=5e-4)
+    np.testing.assert_allclose(sos[1, :3], REFERENCE_HIGHPASS_B, atol=1e-9)
+    np.testing.assert_allclose(sos[1, 3:], REFERENCE_HIGHPASS_A, atol=1e-9)
+
+def test_k_weighting_response_matches_reference_at_48k():
+    freqs = np.linspace(20, 20000, 2000)
+    _, response = signal.sosfreqz(design_k_weighting(48000), worN=freqs, fs=48000)
+    reference = np.array([REFERENCE_SHELF_B + REFERENCE_SHELF_A, REFERENCE_HIGHPASS_B + REFERENCE_HIGHPASS_A])
+    _, expected = signal.sosfreqz(reference, worN=freqs, fs=48000)
+    
+    difference_db = 20 * np.log10(np.abs(response) / np.abs(expected))
+    assert np.max(np.abs(difference_db)) < 0.01
+
+def sine(frequency, sample_rate, seconds, phase=0.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return np.sin(2 * np.pi * frequency * t + phase)
+
+def test_full_scale_997_hz_sine_in_one_channel():
+    for sample_rate in (44100, 48000):
+        audio = np.zeros((sample_rate * 5, 2))
+        audio[:, 0] = sine(997, sample_rate, 5)
+        
+        analysis = analyze_audio(audio, sample_rate)
+        assert abs(analysis["integrated_lufs"] - -3.01) < 0.02
+        assert abs(analysis["max_short_term_lufs"] - -3.01) < 0.02
+
+def test_results_do_not_depend_on_block_size():
+    sample_rate = 48000
+    rng = np.random.default_rng(0)
+    
+    # Level changes so gating, short-term windows and peaks all have something to do
+    audio = rng.normal(0, 0.1, (sample_rate * 7, 2))
+    audio[sample_rate * 2:sample_rate * 3] *= 5
+    audio[sample_rate * 5:] *= 0.001
+    
+    small = analyze_audio(audio, sample_rate, block_size=1234)
+    large = analyze_audio(audio, sample_rate, block_size=65536)
+    assert small.keys() == large.keys()
+    for key in small:
+        assert small[key] == pytest.approx(large[key], abs=1e-9)
+
+def test_silence_has_no_integrated_loudness():
+    analysis = analyze_audio(np.zeros((48000 * 2, 2)), 48000)
+    assert analysis["integrated_lufs"] is None
+    assert analysis["sample_peak_dbfs"] is None
+
+def test_true_peak_between_samples():
+    # A quarter-rate sine at 45 degrees never hits its peak on a sample
+    sample_rate = 48000
+    audio = sine(sample_rate / 4, sample_rate, 1, phase=np.pi / 4)[:, np.newaxis]
+    
+    # Fade in and out so the abrupt start and end don't ring above the steady peak
+    fade = np.sin(np.linspace(0, np.pi / 2, 4800)) ** 2
+    audio[:4800, 0] *= fade
+    audio[-4800:, 0] *= fade[::-1]
+    
+    analysis = analyze_audio(audio, sample_rate, block_size=1001)
+    assert abs(analysis["sample_peak_dbfs"] - -3.01) < 0.01
+    assert abs(analysis["true_peak_dbtp"]) < 0.05
+    
+    # Block edges must not change the oversampled result
+    whole = analyze_audio(audio, sample_rate, block_size=65536)
+    assert analysis["true_peak_dbtp"] == pytest.approx(whole["true_peak_dbtp"], abs=1e-9)
+
+def test_get_analysis_uses_sidecar_cache(tmp_path):
+    sample_rate = 48000
+    file_path = str(tmp_path / "track.wav")
+    with open(file_path, "wb") as f:
+        f.write(b"audio")
+    cache_path = file_path + CACHE_SUFFIX
+    
+    audio = np.zeros((sample_rate, 2))
+    audio[:, 0] = sine(997, sample_rate, 1)
+    first = get_analysis(file_path, audio, sample_rate)
+    assert os.path.exists(cache_path)
+    
+    # Unchanged file: the cached result is returned without looking at the audio
+    silence = np.zeros_like(audio)
+    assert get_analysis(file_path, silence, sample_rate) == first
+    
+    # A new modification time invalidates the cache
+    stat = os.stat(file_path)
+    os.utime(file_path, (stat.st_atime, stat.st_mtime + 10))
+    assert get_analysis(file_path, silence, sample_rate)["integrated_lufs"] is None
+    
+    # So does a new size
+    get_analysis(file_path, audio, sample_rate)
+    with open(file_path, "ab") as f:
+        f.write(b"more")
+    os.utime(file_path, (stat.st_atime, stat.st_mtime + 10))
+    assert get_analysis(file_path, silence, sample_rate)["integrated_lufs"] is None
\ No newline at end of file
@@ -0,0 +1,62 @@
+import numpy as np
+from audio.oscillator import SineOscillator
+from audio.processor import AudioProcessor
+
+SAMPLE_RATE = 48000
+
+def render_in_chunks(oscillator, chunk_sizes):
+    return np.concatenate([oscillator.render(size, SAMPLE_RATE) for size in chunk_sizes])
+
+def test_chunked_render_matches_one_shot_render():
+    chunk_sizes = [1, 7, 480, 1000, 3, 4096, 2413]
+    
+    whole = SineOscillator(440.0).render(sum(chunk_sizes), SAMPLE_RATE)
+    chunked = render_in_chunks(SineOscillator(440.0), chunk_sizes)
+    
+    np.testing.assert_allclose(chunked, whole, atol=1e-9)
+
+def test_chunked_render_matches_one_shot_render_during_glide():
+    chunk_sizes = [100, 1, 999, 2400, 5000]
+    
+    whole_oscillator = SineOscillator(440.0)
+    whole_oscillator.set_frequency(660.0)
+    whole = whole_oscillator.render(sum(chunk_sizes), SAMPLE_RATE)
+    
+    chunked_oscillator = SineOscillator(440.0)
+    chunked_oscillator.set_frequency(660.0)
+    chunked = render_in_chunks(chunked_oscillator, chunk_sizes)
+    
+    np.testing.assert_allclose(chunked, whole, atol=1e-9)
+
+def test_frequency_change_does_not_jump():
+    oscillator = SineOscillator(440.0)
+    before = oscillator.render(1001, SAMPLE_RATE)
+    oscillator.set_frequency(880.0)
+    after = oscillator.render(5000, SAMPLE_RATE)
+    
+    # A sine moves by at most its phase increment per sample, at the highest frequency involved
+    max_step = 2 * np.pi * 880.0 / SAMPLE_RATE
+    steps = np.abs(np.diff(np.concatenate((before, after))))
+    assert np.max(steps) <= max_step + 1e-12
+    
+    # And it ends up at the new frequency
+    assert oscillator.frequency == 880.0
+
+def test_reset_restarts_the_phase():
+    oscillator = SineOscillator(440.0)
+    first = oscillator.render(777, SAMPLE_RATE)
+    oscillator.reset()
+    np.testing.assert_allclose(oscillator.render(777, SAMPLE_RATE), first, atol=1e-12)
+
+def test_processor_binaural_carrier_continues_between_renders():
+    processor = AudioProcessor()
+    processor.set_binaural(True, 10)
+    silence = np.zeros((3000, 2))
+    
+    processor.reset_binaural()
+    whole = processor._apply_binaural(np.zeros((6000, 2)), SAMPLE_RATE)
+    processor.reset_binaural()
+    first = processor._apply_binaural(silence, SAMPLE_RATE)
+    second = processor._apply_binaural(silence, SAMPLE_RATE)
+    
+    np.testing.assert_allclose(np.concatenate((first, second)), whole, atol=1e-9)
\ No newline at end of file
@@ -0,0 +1,89 @@
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+from audio import playlist
+from audio.playlist import PlaylistPlayer
+
+SAMPLE_RATE = 48000
+
+def make_track(index, length):
+    # Non-zero samples so silence inserted between tracks shows up
+    values = (np.arange(length) % 1000 + 1 + 1000 * index).astype(np.int16)
+    return np.stack((values, -values), axis=1)
+
+class FakeOutputStream:
+    # Pulls fixed-size blocks from the callback like a sound card would
+    def __init__(self, samplerate, channels, dtype, callback):
+        self.channels = channels
+        self.callback = callback
+        self.blocks = []
+        self.running = False
+        self.thread = None
+        FakeOutputStream.instances.append(self)
+    
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.start()
+    
+    def _run(self):
+        while self.running:
+            outdata = np.empty((256, self.channels), dtype=np.int16)
+            self.callback(outdata, 256, None, None)
+            self.blocks.append(outdata)
+            time.sleep(0.0005)
+    
+    def stop(self):
+        self.running = False
+        self.thread.join()
+    
+    abort = stop
+    
+    def close(self):
+        pass
+
+def test_fill_output_joins_tracks_without_gaps():
+    player = PlaylistPlayer(None)
+    tracks = [make_track(0, 1000), make_track(1, 700)]
+    player.output_queue.extend(tracks)
+    
+    blocks = []
+    for _ in range(8):
+        outdata = np.empty((256, 2), dtype=np.int16)
+        player._fill_output(outdata, 256, None, None)
+        blocks.append(outdata)
+    output = np.concatenate(blocks)
+    
+    np.testing.assert_array_equal(output[:1700], np.concatenate(tracks))
+    assert not output[1700:].any()
+    assert not player.output_queue
+
+def test_playlist_plays_tracks_back_to_back_in_one_stream(monkeypatch):
+    FakeOutputStream.instances = []
+    monkeypatch.setattr(playlist, "sd", SimpleNamespace(OutputStream=FakeOutputStream))
+    
+    player = PlaylistPlayer(SimpleNamespace(settings_version=0))
+    tracks = {"a": make_track(0, 20000), "b": make_track(1, 15000), "c": make_track(2, 30000)}
+    
+    def render_track(file_path):
+        player.sample_rate = SAMPLE_RATE
+        if file_path == "broken":
+            raise ValueError("cannot decode")
+        return tracks[file_path]
+    monkeypatch.setattr(player, "_render_track", render_track)
+    
+    for file_path in ("a", "broken", "b", "c"):
+        player.add_track(file_path)
+    player.play()
+    player.playback_thread.join(10.0)
+    
+    assert not player.playback_thread.is_alive()
+    assert len(FakeOutputStream.instances) == 1
+    
+    # Only leading and trailing silence; the tracks themselves follow each other sample for sample
+    output = np.concatenate(FakeOutputStream.instances[0].blocks)
+    playing = np.flatnonzero(output[:, 0])
+    output = output[playing[0]:playing[-1] + 1]
+    np.testing.assert_array_equal(output, np.concatenate((tracks["a"], tracks["b"], tracks["c"])))
+    player.stop()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import json
+import numpy as np
+from audio import presets, processor_effects
+from audio.processor import AudioProcessor
+
+def configured_processor():
+    processor = AudioProcessor()
+    processor.set_volume(0.8)
+    processor.set_equalizer({32: 3, 64: 2, 125: 0, 250: -1, 500: 0, 1000: 1, 2000: 0, 4000: -2, 8000: 0, 16000: 4})
+    processor.set_bass_boost(True, 0.7)
+    processor.set_reverb(True, 0.4)
+    processor.set_limiter(True, ceiling_db=-1.0)
+    return processor
+
+def fail_design(*args, **kwargs):
+    raise AssertionError("design should have come from the preset")
+
+def test_preset_round_trip_reuses_compiled_designs(tmp_path, monkeypatch):
+    source = configured_processor()
+    preset_path = str(tmp_path / "preset.json")
+    presets.save_preset(preset_path, source, name="Test")
+    
+    processor = AudioProcessor()
+    presets.apply_preset(processor, presets.load_preset(preset_path))
+    assert presets.capture_settings(processor) == presets.capture_settings(source)
+    
+    # Equalizer, bass boost and reverb for both default sample rates
+    assert len(processor.design_cache) == 6
+    
+    # Rendering must not design anything new
+    for name in ("design_equalizer", "design_bass_boost", "design_reverb"):
+        monkeypatch.setattr(processor_effects, name, fail_design)
+    for sample_rate in presets.DEFAULT_SAMPLE_RATES:
+        processor._apply_all_processing(np.zeros((sample_rate // 10, 2)), sample_rate)
+    assert len(processor.design_cache) == 6
+
+def test_edited_settings_do_not_reuse_stale_designs(tmp_path):
+    preset_path = str(tmp_path / "preset.json")
+    presets.save_preset(preset_path, configured_processor())
+    
+    # Hand-edit an equalizer gain without recompiling
+    with open(preset_path) as f:
+        preset = json.load(f)
+    preset["settings"]["equalizer"]["1000"] = 6
+    with open(preset_path, "w") as f:
+        json.dump(preset, f)
+    
+    processor = AudioProcessor()
+    presets.apply_preset(processor, presets.load_preset(preset_path))
+    
+    # Bass boost and reverb still match, the equalizer is designed from the edited gains
+    assert sorted(effect for effect, _, _ in processor.design_cache) == ["bass_boost"] * 2 + ["reverb"] * 2
+    gains = processor.get_design("equalizer", 48000, presets.design_params(preset["settings"])["equalizer"])
+    expected = processor_effects.design_equalizer(48000, processor.equalizer_values)
+    np.testing.assert_array_equal(gains, expected)
\ No newline at end of file
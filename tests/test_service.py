@@ -0,0 +1,128 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from audio.service import RenderClient, RenderService, _send
+
+class StubRenderer:
+    # Stands in for render_job: records the order jobs run in and reports progress like a worker process
+    def __init__(self):
+        self.progress = queue.Queue()
+        self.order = []
+        self.gates = {}
+    
+    def __call__(self, job_id, input_path, output_path, settings, preset_path=None, target_lufs=None):
+        try:
+            self.order.append(input_path)
+            if input_path in self.gates:
+                self.gates[input_path].wait(5.0)
+            self.progress.put((job_id, "rendering", 0.5))
+            if input_path == "missing.wav":
+                raise FileNotFoundError(input_path)
+            return {"output": output_path, "duration": 1.0}
+        finally:
+            self.progress.put((job_id, None, None))
+
+def run_service(test, max_workers=1):
+    # Runs test(service, client, renderer) against a service on an ephemeral port
+    async def main():
+        renderer = StubRenderer()
+        service = RenderService(max_workers, render_function=renderer,
+                                executor=ThreadPoolExecutor(max_workers), progress_queue=renderer.progress)
+        server = await service.start(port=0)
+        client = await RenderClient.connect(port=server.sockets[0].getsockname()[1])
+        try:
+            await asyncio.wait_for(test(service, client, renderer), 10.0)
+        finally:
+            for gate in renderer.gates.values():
+                gate.set()
+            await client.close()
+            await service.stop()
+    asyncio.run(main())
+
+async def collect(client, job_id):
+    return [event async for event in client.wait(job_id)]
+
+async def send_raw(client, request):
+    # Bypasses RenderClient.submit so malformed fields reach the service as sent
+    await _send(client.writer, request)
+    return await client._next_event(lambda event: event["event"] in ("queued", "error"))
+
+def test_higher_priority_first_and_fifo_within_priority():
+    async def test(service, client, renderer):
+        # Hold the only worker so everything else queues up behind it
+        renderer.gates["blocker.wav"] = threading.Event()
+        blocker = await client.submit("blocker.wav", "out.wav")
+        while renderer.order != ["blocker.wav"]:
+            await asyncio.sleep(0.01)
+        
+        jobs = []
+        for name, priority in (("low.wav", 0), ("high-1.wav", 5), ("mid.wav", 1), ("high-2.wav", 5), ("low-2.wav", 0)):
+            jobs.append(await client.submit(name, "out.wav", priority=priority))
+        
+        renderer.gates["blocker.wav"].set()
+        for job in [blocker] + jobs:
+            await collect(client, job["job_id"])
+        
+        assert renderer.order == ["blocker.wav", "high-1.wav", "high-2.wav", "mid.wav", "low.wav", "low-2.wav"]
+    run_service(test)
+
+def test_events_arrive_in_order():
+    async def test(service, client, renderer):
+        queued = await client.submit("song.wav", "out.wav")
+        failing = await client.submit("missing.wav", "out.wav")
+        assert queued["event"] == "queued"
+        
+        events = await collect(client, queued["job_id"])
+        assert [event["event"] for event in events] == ["started", "progress", "completed"]
+        assert events[1]["stage"] == "rendering"
+        assert events[2]["result"] == {"output": "out.wav", "duration": 1.0}
+        
+        events = await collect(client, failing["job_id"])
+        assert [event["event"] for event in events] == ["started", "progress", "failed"]
+        assert "missing.wav" in events[2]["error"]
+    run_service(test)
+
+def test_invalid_requests_are_rejected_without_creating_jobs():
+    async def test(service, client, renderer):
+        for request in (
+            {"input": "song.wav", "output": "out.wav", "priority": "1"},
+            {"input": "song.wav", "output": "out.wav", "settings": "loud"},
+            {"input": None, "output": "out.wav"},
+            {"input": "song.wav", "output": "out.wav", "target_lufs": "-14"},
+        ):
+            reply = await send_raw(client, dict(request, type="submit"))
+            assert reply["event"] == "error"
+            assert service.jobs == {}
+        
+        assert service.get_metrics()["queue_depth"] == 0
+        assert renderer.order == []
+    run_service(test)
+
+def test_metrics():
+    async def test(service, client, renderer):
+        renderer.gates["blocker.wav"] = threading.Event()
+        jobs = [await client.submit("blocker.wav", "out.wav")]
+        for name in ("a.wav", "b.wav", "missing.wav"):
+            jobs.append(await client.submit(name, "out.wav"))
+        
+        # Wait until the blocker has been picked up, the rest are still queued
+        while renderer.order != ["blocker.wav"]:
+            await asyncio.sleep(0.01)
+        metrics = await client.metrics()
+        assert metrics["queue_depth"] == 3
+        assert metrics["running"] == 1
+        assert metrics["latency_p50"] is None
+        
+        renderer.gates["blocker.wav"].set()
+        for job in jobs:
+            await collect(client, job["job_id"])
+        
+        metrics = await client.metrics()
+        assert metrics["queue_depth"] == 0
+        assert metrics["running"] == 0
+        assert metrics["completed"] == 3
+        assert metrics["failed"] == 1
+        assert 0 < metrics["latency_p50"] <= metrics["latency_p90"] <= metrics["latency_p99"]
+        assert metrics["throughput_per_min"] > 0
+    run_service(test)
\ No newline at end of file